@@ -1,94 +1,849 @@
 from __future__ import annotations
 import pygame
 import os
+import json
+import time
+import pickle
+import sqlite3
+import copy
+import queue
+import threading
+import weakref
 import numpy as np
-from itertools import product
+from math import exp, inf, lgamma
+
+# Posted once a second while a round is running so the header clock can tick without polling
+CLOCK_TICK = pygame.USEREVENT + 1
+
+class NeighbourTable(dict):
+
+    # CSR adjacency of one board shape: the neighbours of cell are indices[offsets[cell]:offsets[cell + 1]].
+    # The Python lists the solver loops iterate are cut from it when a cell is looked up. The first limit of
+    # them are kept, every cell of the presets up to Huge, bigger boards cut the rest on every lookup.
+    limit = 1 << 15
+
+    def __init__(self, offsets:np.ndarray, indices:np.ndarray):
+        super().__init__()
+        self.offsets = offsets
+        self.indices = indices
+
+    def __missing__(self, cell:int) -> list[int]:
+        row = self.indices[self.offsets[cell]:self.offsets[cell + 1]].tolist()
+        if len(self) < self.limit:
+            self[cell] = row
+        return row
+
+# Tables in use, by shape and radius. Boards hold them, so one is shared for as long as a board of its shape exists.
+neighbour_tables = weakref.WeakValueDictionary()
+
+def neighbour_table(map_size_in_tiles:tuple[int, int], radius:int = 1) -> NeighbourTable:
+    key = (tuple(map_size_in_tiles), radius)
+    table = neighbour_tables.get(key)
+    if table is None:
+        table = neighbour_tables[key] = NeighbourTable(*neighbour_arrays(*key))
+    return table
+
+def neighbour_arrays(map_size_in_tiles:tuple[int, int], radius:int = 1, chunk:int = 1 << 16) -> tuple[np.ndarray, np.ndarray]:
+    # Counted one offset at a time, then filled a chunk of cells at a time, so the only temporaries are
+    # (chunk, offsets) sized however big the board is
+    width, height = map_size_in_tiles
+    size = width * height
+    x, y = np.divmod(np.arange(size, dtype = np.int32), height)
+    moves = [(dx, dy) for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1) if dx or dy]
+    counts = np.zeros(size, dtype = np.int32)
+    for dx, dy in moves:
+        counts += (x + dx >= 0) & (x + dx < width) & (y + dy >= 0) & (y + dy < height)
+    offsets = np.zeros(size + 1, dtype = np.int32 if counts.sum() < 2**31 else np.int64)
+    np.cumsum(counts, out = offsets[1:])
+    del counts
+
+    dx, dy = np.array(moves, dtype = np.int32).T
+    indices = np.empty(offsets[-1], dtype = np.int32)
+    for start in range(0, size, chunk):
+        stop = min(start + chunk, size)
+        nx, ny = x[start:stop, None] + dx, y[start:stop, None] + dy
+        inside = (nx >= 0) & (nx < width) & (ny >= 0) & (ny < height)
+        indices[offsets[start]:offsets[stop]] = (nx * height + ny)[inside]
+    indices.flags.writeable = offsets.flags.writeable = False
+    return offsets, indices
+
+class Frontier():
+
+    # Revealed numbered cells that still constrain hidden ones, in an insertion-ordered dict for O(1) add,
+    # remove and membership. Groups of 8-adjacent frontier cells are kept up to date incrementally: new cells
+    # wait in pending and are merged into the groups they touch, a removal only marks its group as possibly
+    # split, and components() settles both, touching only the cells and groups that changed.
+    def __init__(self, neighbours:NeighbourTable):
+        self.neighbours = neighbours
+        self.cells = {}
+        self.pending = {}
+        self.group = {}
+        self.members = {}
+        self.split = set()
+        self.next_group = 0
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def __contains__(self, cell:int) -> bool:
+        return cell in self.cells
+
+    def add(self, cell:int):
+        if cell not in self.cells:
+            self.cells[cell] = None
+            self.pending[cell] = None
+
+    def update(self, cells:list[int]):
+        for cell in cells:
+            self.add(cell)
+
+    def remove(self, cell:int):
+        if cell not in self.cells:
+            return
+        del self.cells[cell]
+        if cell in self.pending:
+            del self.pending[cell]
+            return
+        g = self.group.pop(cell)
+        del self.members[g][cell]
+        if self.members[g]:
+            self.split.add(g)
+        else:
+            del self.members[g]
+            self.split.discard(g)
+
+    def new_group(self) -> int:
+        self.next_group += 1
+        self.members[self.next_group] = {}
+        return self.next_group
+
+    def merge(self, cell:int):
+        group = self.group
+        groups = {group[n] for n in self.neighbours[cell] if n in group}
+        if groups:
+            # Merge into the largest touching group, so every cell only moves O(log n) times
+            target = max(groups, key = lambda g: len(self.members[g]))
+            for g in groups - {target}:
+                moved = self.members.pop(g)
+                for member in moved:
+                    self.group[member] = target
+                self.members[target].update(moved)
+                if g in self.split:
+                    self.split.discard(g)
+                    self.split.add(target)
+        else:
+            target = self.new_group()
+        group[cell] = target
+        self.members[target][cell] = None
+
+    def components(self) -> list[list[int]]:
+        for cell in self.pending:
+            self.merge(cell)
+        self.pending.clear()
+        for g in self.split:
+            remaining = self.members.pop(g)
+            while remaining:
+                cell = next(iter(remaining))
+                target = self.new_group()
+                queue = [cell]
+                del remaining[cell]
+                while queue:
+                    current = queue.pop()
+                    self.group[current] = target
+                    self.members[target][current] = None
+                    for n in self.neighbours[current]:
+                        if n in remaining:
+                            del remaining[n]
+                            queue.append(n)
+        self.split.clear()
+        return [list(members) for members in self.members.values()]
+
+class Board():
+
+    def __init__(self, map_size_in_tiles:tuple[int, int], number_of_bombs:int, seed:int|None = None):
+        self.map_size_in_tiles = tuple(map_size_in_tiles)
+        self.width, self.height = self.map_size_in_tiles
+        self.size = self.width * self.height
+        self.number_of_bombs = number_of_bombs
+        self.number_of_flags = 0
+        # Running counters kept by the reveal and flag paths, so win checks and score never scan the board
+        self.revealed_safe = 0
+        self.flagged_mines = 0
+        self.revealed = 0
+        self.firstclick = True
+        self.go = False
+        self.won = False
 
-class Tile():
+        # Packed cell state, indexed by cell = x * height + y (the order of map_array.flatten())
+        self.bomb = np.zeros(self.size, dtype = bool)
+        self.number = np.zeros(self.size, dtype = np.int8)
+        self.show_number = np.zeros(self.size, dtype = np.int8)
+        self.hidden = np.ones(self.size, dtype = bool)
+        self.flagged = np.zeros(self.size, dtype = bool)
+        self.bombs = np.empty(0, dtype = np.intp)
+        # Zero region of every cell (-1 for numbered cells), filled in once the mines are placed
+        self.region = np.full(self.size, -1, dtype = np.int32)
+
+        # The mines only depend on the seed and the first click, so a game can be rebuilt from its event log
+        self.seed = int(np.random.randint(2**31)) if seed is None else seed
+        self.rng = np.random.default_rng(self.seed)
+        self.events = []
+        self.solving = False
+        self.started = time.perf_counter()
+
+        self.observers = []
+        self.build_neighbours()
+        self.frontier = Frontier(self.neighbours)
+
+    def cell(self, x:int, y:int) -> int:
+        return x * self.height + y
+
+    def copy(self) -> Board:
+        # Independent cell state to play ahead on, the shape tables and zero regions never change so they are shared
+        board = copy.copy(self)
+        for name in ("bomb", "number", "show_number", "hidden", "flagged"):
+            setattr(board, name, getattr(self, name).copy())
+        board.observers = []
+        board.events = []
+        board.solving = False
+        board.frontier = Frontier(self.neighbours)
+        board.frontier.update(self.frontier)
+        return board
+
+    def coords(self, cell:int) -> tuple[int, int]:
+        return divmod(cell, self.height)
+
+    def watch(self) -> list:
+        # Every cell whose face may have changed is appended to the returned list
+        changes = []
+        self.observers.append(changes)
+        return changes
+
+    def changed(self, cell:int):
+        for changes in self.observers:
+            changes.append(cell)
+
+    def changed_all(self):
+        for changes in self.observers:
+            changes.extend(range(self.size))
+
+    def record(self, code:str, cell:int = -1):
+        self.events.append((int((time.perf_counter() - self.started) * 1000), code, cell))
+
+    def build_neighbours(self):
+        self.neighbours = neighbour_table(self.map_size_in_tiles)
+        self.neighbourhood_table = None
 
-    def __init__(self, master:Game, x:int, y:int, tile_size:tuple[int, int], face:pygame.surface):
-        self.master = master
-        self.map_x = x
-        self.map_y = y
-        self.screen_x = x * tile_size[0]
-        self.screen_y = y * tile_size[1] + master.header_size
-        self.bomb = False
-        self.number = 0
-        self.show_number = 0
-        self.hidden = True
-        self.flagged = False
-        self.face = face
-        self.master.screen.blit(self.face, (self.screen_x, self.screen_y))
+    @property
+    def neighbourhood(self) -> NeighbourTable:
+        # Cells within distance 2, the only ones whose neighbours can overlap with a cell's own. Only the pair
+        # logic needs them, so the table is built the first time it is asked for.
+        if self.neighbourhood_table is None:
+            self.neighbourhood_table = neighbour_table(self.map_size_in_tiles, 2)
+        return self.neighbourhood_table
+
+    def neighbour_sum(self, mask:np.ndarray) -> np.ndarray:
+        # How many of the eight neighbours of every cell are set in mask, as one vectorized 3x3 sum
+        width, height = self.map_size_in_tiles
+        grid = np.pad(mask.reshape(self.map_size_in_tiles).astype(np.int8), 1)
+        total = np.zeros(self.map_size_in_tiles, dtype = np.int8)
+        for dx in range(3):
+            for dy in range(3):
+                if (dx, dy) != (1, 1):
+                    total += grid[dx:dx + width, dy:dy + height]
+        return total.ravel()
+
+    def decide_bombs(self, to_avoid:int):
+        # Sample from the cell ids outside the 3x3 around the first click, then count every cell's mines at once
+        allowed = np.ones(self.size, dtype = bool)
+        allowed[to_avoid] = False
+        allowed[self.neighbours[to_avoid]] = False
+        self.bombs = self.rng.choice(np.flatnonzero(allowed), size = self.number_of_bombs, replace = False)
+        self.bomb[self.bombs] = True
+        self.flagged_mines = int(np.count_nonzero(self.bomb & self.flagged))
+
+        self.number[:] = self.neighbour_sum(self.bomb)
+        self.show_number[:] = self.number - self.neighbour_sum(self.flagged)
+        self.label_zero_regions()
+
+    def label_zero_regions(self):
+        # Connected zero cells get a region id, and every region keeps its cells plus its numbered border as
+        # one sorted run of region_cells, which is exactly what a flood fill from any of its cells reveals.
+        width, height = self.map_size_in_tiles
+        zero = ((self.number == 0) & ~self.bomb).reshape(self.map_size_in_tiles)
+        ids = np.arange(self.size).reshape(self.map_size_in_tiles)
+        padded = np.pad(zero, 1)
+        edges = []
+        for dx, dy in ((0, 1), (1, -1), (1, 0), (1, 1)):
+            both = zero & padded[1 + dx:1 + dx + width, 1 + dy:1 + dy + height]
+            edges.append((ids[both], ids[both] + dx * height + dy))
+        a = np.concatenate([edge[0] for edge in edges])
+        b = np.concatenate([edge[1] for edge in edges])
+
+        # Union-find over zero-zero edges: hook the larger root under the smaller one, then flatten
+        parent = np.arange(self.size)
+        while True:
+            ra, rb = parent[a], parent[b]
+            merge = ra != rb
+            if not merge.any():
+                break
+            np.minimum.at(parent, np.maximum(ra, rb)[merge], np.minimum(ra, rb)[merge])
+            while True:
+                grand = parent[parent]
+                if np.array_equal(grand, parent):
+                    break
+                parent = grand
+
+        zero = zero.ravel()
+        roots, labels = np.unique(parent[zero], return_inverse = True)
+        self.region[:] = -1
+        self.region[zero] = labels
+
+        # A cell belongs to every distinct region found in its 3x3, so border cells can be in several
+        grid = np.pad(self.region.reshape(self.map_size_in_tiles), 1, constant_values = -1)
+        around = np.sort(np.stack([grid[dx:dx + width, dy:dy + height].ravel() for dx in range(3) for dy in range(3)]), axis = 0)
+        around[1:][around[1:] == around[:-1]] = -1
+        index, cells = np.nonzero(around >= 0)
+        keys = np.sort(around[index, cells].astype(np.int64) * self.size + cells)
+        self.region_cells = keys % self.size
+        self.region_offsets = np.searchsorted(keys // self.size, np.arange(len(roots) + 1))
+
+    def reveal_region(self, region:int) -> bool:
+        # Bulk reveal of a zero region and its border. Only valid while no flag sits on or next to it and
+        # none of its zero cells is open yet, otherwise the caller falls back to the step by step flood fill.
+        cells = self.region_cells[self.region_offsets[region]:self.region_offsets[region + 1]]
+        if self.flagged[cells].any() or (self.show_number[cells] != self.number[cells]).any():
+            return False
+        if not self.hidden[cells[self.number[cells] == 0]].all():
+            return False
+        opened = cells[self.hidden[cells]]
+        self.hidden[opened] = False
+        self.revealed_safe += len(opened)
+        self.revealed += len(opened)
+        for changes in self.observers:
+            changes.extend(opened.tolist())
+        self.frontier.update(opened[self.number[opened] != 0].tolist())
+        return True
 
-        self.neighbours = []
-        
-        pygame.display.flip()
-    
-    def update_face(self): 
-        if self.bomb and not self.hidden:
-            self.face = self.master.faces[9]
-        elif self.flagged:
-            self.face = self.master.faces[10]
-        elif self.hidden:
-            self.face = self.master.faces[-1]
-        else:
-            self.face = self.master.faces[self.show_number]
-        
-        self.master.screen.blit(self.face, (self.screen_x, self.screen_y))
-        pygame.display.flip()
-    
-    def get_neighbours(self):
-        self.neighbours = [self.master.map_array[i, j]
-            for i in range(max(0, self.map_x - 1), min(self.master.map_size_in_tiles[0], self.map_x + 2))
-            for j in range(max(0, self.map_y - 1), min(self.master.map_size_in_tiles[1], self.map_y + 2))
-            if (i, j) != (self.map_x, self.map_y)]
-    
-    def discover_neighbours(self):
-        if not self.hidden or self.bomb:
+    def update_show_number(self, cell:int):
+        neighbours = self.neighbours[cell]
+        self.show_number[cell] = np.count_nonzero(self.bomb[neighbours]) - np.count_nonzero(self.flagged[neighbours])
+        if self.show_number[cell] == 0:
+            self.frontier.remove(cell)
+
+    def free_neighbours(self, cell:int) -> list[int]:
+        hidden, flagged = self.hidden, self.flagged
+        return [n for n in self.neighbours[cell] if hidden[n] and not flagged[n]]
+
+    def face_index(self, cell:int) -> int:
+        if self.bomb[cell] and not self.hidden[cell]:
+            return 9
+        elif self.flagged[cell]:
+            return 10
+        elif self.hidden[cell]:
+            return -1
+        return int(self.show_number[cell])
+
+    def face_indices(self, cells:np.ndarray) -> np.ndarray:
+        return self.faces(self.bomb[cells], self.hidden[cells], self.flagged[cells], self.show_number[cells])
+
+    @staticmethod
+    def faces(bomb:np.ndarray, hidden:np.ndarray, flagged:np.ndarray, show_number:np.ndarray) -> np.ndarray:
+        # face_index of arrays of cells of any shape, lowest priority first
+        faces = show_number.astype(np.int64)
+        faces[hidden] = -1
+        faces[flagged] = 10
+        faces[bomb & ~hidden] = 9
+        return faces
+
+    def discover_neighbours(self, cell:int):
+        hidden, bomb = self.hidden, self.bomb
+        if not hidden[cell] or bomb[cell]:
+            return
+        if self.region[cell] >= 0 and self.reveal_region(self.region[cell]):
             return
 
-        stack = [self]  # Start with this tile
+        stack = [cell]  # Start with this cell
         while stack:
-            tile = stack.pop()
-            if tile.hidden and not tile.bomb:
-                tile.hidden = False
-                tile.update_face()
+            current = stack.pop()
+            if hidden[current] and not bomb[current]:
+                hidden[current] = False
+                self.revealed_safe += 1
+                if not self.flagged[current]:
+                    self.revealed += 1
+                self.changed(current)
 
                 # Only add neighbors to the stack if the number is 0
-                if tile.show_number == 0:
-                    for neighbour in tile.neighbours:
-                        if neighbour.hidden and not neighbour.bomb:
+                if self.show_number[current] == 0:
+                    for neighbour in self.neighbours[current]:
+                        if hidden[neighbour] and not bomb[neighbour]:
                             stack.append(neighbour)
-                elif tile not in tile.master.frontier:
-                    tile.master.frontier.append(tile)
+                else:
+                    self.frontier.add(current)
+
+    def left_click_handler(self, cell:int):
+        self.record("F" if self.firstclick else "l" if self.solving else "L", cell)
+        if self.firstclick:
+            self.decide_bombs(cell)
+            self.firstclick = False
+
+        if self.bomb[cell] and not self.flagged[cell]:
+            self.game_over()
+
+        if self.number[cell] != 0 and self.show_number[cell] == 0:
+            for neighbour in self.neighbours[cell]:
+                if not self.flagged[neighbour]:
+                    self.discover_neighbours(neighbour)
+            for neighbour in self.neighbours[cell]:
+                if self.bomb[neighbour] and not self.flagged[neighbour]:
+                    self.game_over()
+
+        self.discover_neighbours(cell)
+        self.check_winning_condition()
+
+    def right_click_handler(self, cell:int):
+        self.record("r" if self.solving else "R", cell)
+        if self.hidden[cell]:
+            change = -1 if self.flagged[cell] else 1
+            self.flagged[cell] = change > 0
+            self.number_of_flags += change
+            self.revealed += change
+            if self.bomb[cell]:
+                self.flagged_mines += change
+            self.changed(cell)
+
+        for neighbour in self.neighbours[cell]:
+            self.update_show_number(neighbour)
+            self.changed(neighbour)
+
+        self.check_winning_condition()
+
+    def game_over(self):
+        for cell in self.bombs:
+            if self.hidden[cell]:
+                self.hidden[cell] = False
+                if not self.flagged[cell]:
+                    self.revealed += 1
+                self.changed(cell)
+        self.go = True
+
+    def check_winning_condition(self) -> bool:
+        if self.won:
+            return True
+        if self.revealed_safe != self.size - self.number_of_bombs or self.flagged_mines != self.number_of_bombs:
+            return False
+        self.won = True
+        self.show_number[:] = self.number
+        self.changed_all()
+        return True
+
+    def reveal_all(self):
+        self.hidden[:] = False
+        self.revealed_safe = self.size - int(np.count_nonzero(self.bomb))
+        self.revealed = self.size
+        self.changed_all()
+
+    def load_state(self, bomb:np.ndarray, hidden:np.ndarray, flagged:np.ndarray, firstclick:bool, go:bool, won:bool):
+        # Puts a saved position back. The numbers, counters, zero regions and frontier all follow from the three planes.
+        self.bomb[:] = bomb
+        self.hidden[:] = hidden
+        self.flagged[:] = flagged
+        self.firstclick, self.go, self.won = firstclick, go, won
+        self.bombs = np.flatnonzero(self.bomb)
+        self.number_of_flags = int(np.count_nonzero(self.flagged))
+        self.flagged_mines = int(np.count_nonzero(self.bomb & self.flagged))
+        self.revealed_safe = int(np.count_nonzero(~self.hidden & ~self.bomb))
+        # A flag counts as revealed, and stays counted once a flood opens the cell under it
+        self.revealed = int(np.count_nonzero(~self.hidden | self.flagged))
+        if not firstclick:
+            self.number[:] = self.neighbour_sum(self.bomb)
+            self.label_zero_regions()
+        self.show_number[:] = self.number - self.neighbour_sum(self.flagged)
+        self.frontier = Frontier(self.neighbours)
+        self.frontier.update(np.flatnonzero(~self.hidden & ~self.bomb & (self.show_number != 0)).tolist())
+        if won:
+            self.show_number[:] = self.number
+        self.changed_all()
+
+class VecEnv():
+
+    # Many boards of one shape stepped together for agents, headless, as stacked (boards, cells) arrays in Board's
+    # cell order. An action is a cell to left click, or size + cell to right click. Clicks, chords and cascades
+    # follow Board.left_click_handler and right_click_handler, and the mines are drawn like Board.decide_bombs,
+    # so every seed plays out exactly as Board(..., seed) would. Rewards are the change of the untimed Game score.
+    # Observations are the face the game would draw for every cell: 0-8 numbers, 9 mine, 10 flag, 11 hidden.
+    def __init__(self, num_boards:int, map_size_in_tiles:tuple[int, int], number_of_bombs:int):
+        self.num_boards = num_boards
+        self.map_size_in_tiles = tuple(map_size_in_tiles)
+        self.width, self.height = self.map_size_in_tiles
+        self.size = self.width * self.height
+        self.number_of_bombs = number_of_bombs
+        offsets, indices = neighbour_arrays(self.map_size_in_tiles)
+
+        # The neighbour table as a dense (cells, 8) array, short rows padded with the cell itself and masked out
+        counts = np.diff(offsets)
+        rows = np.repeat(np.arange(self.size), counts)
+        self.dense = np.repeat(np.arange(self.size), 8).reshape(self.size, 8)
+        self.dense[rows, np.arange(len(rows)) - offsets[rows]] = indices
+        self.valid = np.arange(8) < counts[:, None]
+
+        shape = (num_boards, self.size)
+        self.bomb = np.zeros(shape, dtype = bool)
+        self.number = np.zeros(shape, dtype = np.int8)
+        self.show_number = np.zeros(shape, dtype = np.int8)
+        self.hidden = np.ones(shape, dtype = bool)
+        self.flagged = np.zeros(shape, dtype = bool)
+        self.number_of_flags = np.zeros(num_boards, dtype = np.int64)
+        self.revealed_safe = np.zeros(num_boards, dtype = np.int64)
+        self.flagged_mines = np.zeros(num_boards, dtype = np.int64)
+        self.revealed = np.zeros(num_boards, dtype = np.int64)
+        self.firstclick = np.ones(num_boards, dtype = bool)
+        self.go = np.zeros(num_boards, dtype = bool)
+        self.won = np.zeros(num_boards, dtype = bool)
+        self.seeds = np.zeros(num_boards, dtype = np.int64)
 
-    def update_number(self):
-        for tile in self.neighbours:
-            if tile.bomb:
-                self.number += 1
-    
-    def update_show_number(self):
-        self.show_number = 0
-        for tile in self.neighbours:
-            if tile.bomb:
-                self.show_number += 1
-            if tile.flagged:
-                self.show_number -= 1
-        if self.show_number == 0 and self in self.master.frontier:
-            self.master.frontier.remove(self)
-    
-    @property
-    def is_in_frontier(self) -> bool:
-        if self in self.master.frontier: return True
-        else: return False
-    
     @property
-    def free_neighbours(self) -> list:
-        return [n for n in self.neighbours if not n.flagged and n.hidden]
+    def done(self) -> np.ndarray:
+        return self.go | self.won
+
+    def reset(self, seeds:list[int] | None = None, boards:list[int] | None = None) -> np.ndarray:
+        # Starts new games on every board, or only on the given ones, with random seeds unless seeds are given
+        boards = np.arange(self.num_boards) if boards is None else np.asarray(boards)
+        self.seeds[boards] = np.random.randint(2**31, size = len(boards)) if seeds is None else seeds
+        for array in (self.bomb, self.number, self.show_number, self.flagged, self.number_of_flags,
+                      self.revealed_safe, self.flagged_mines, self.revealed, self.go, self.won):
+            array[boards] = 0
+        self.hidden[boards] = True
+        self.firstclick[boards] = True
+        return self.observe()
+
+    def observe(self) -> np.ndarray:
+        faces = Board.faces(self.bomb, self.hidden, self.flagged, self.show_number) % 12
+        return faces.astype(np.uint8).reshape(self.num_boards, self.width, self.height)
+
+    def scores(self) -> np.ndarray:
+        points = Game.points(self.map_size_in_tiles, self.number_of_bombs, self.revealed, self.won, 0, -1)
+        return np.where(self.firstclick, 0, points)
+
+    def step(self, actions:np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict]:
+        # One action per board, boards whose game is over ignore theirs until they are reset
+        actions = np.asarray(actions)
+        before = self.scores()
+        live = ~self.done
+        cells = actions % self.size
+        flag = actions >= self.size
+        self.right_click(np.flatnonzero(live & flag), cells[live & flag])
+        self.left_click(np.flatnonzero(live & ~flag), cells[live & ~flag])
+
+        won = live & ~self.won & (self.revealed_safe == self.size - self.number_of_bombs) & (self.flagged_mines == self.number_of_bombs)
+        self.won |= won
+        self.show_number[won] = self.number[won]
+        return self.observe(), self.scores() - before, self.done, {"won": self.won.copy(), "lost": self.go.copy()}
+
+    def neighbour_sum(self, mask:np.ndarray) -> np.ndarray:
+        # Board.neighbour_sum over a stack of boards
+        grid = np.pad(mask.reshape(-1, self.width, self.height).astype(np.int8), ((0, 0), (1, 1), (1, 1)))
+        total = np.zeros((len(mask), self.width, self.height), dtype = np.int8)
+        for dx in range(3):
+            for dy in range(3):
+                if (dx, dy) != (1, 1):
+                    total += grid[:, dx:dx + self.width, dy:dy + self.height]
+        return total.reshape(len(mask), self.size)
+
+    def spread(self, mask:np.ndarray) -> np.ndarray:
+        # Every cell in or next to a cell set in mask, for a stack of boards
+        grid = np.pad(mask.reshape(-1, self.width, self.height), ((0, 0), (1, 1), (1, 1)))
+        total = np.zeros((len(mask), self.width, self.height), dtype = bool)
+        for dx in range(3):
+            for dy in range(3):
+                total |= grid[:, dx:dx + self.width, dy:dy + self.height]
+        return total.reshape(len(mask), self.size)
+
+    def right_click(self, boards:np.ndarray, cells:np.ndarray):
+        hidden = self.hidden[boards, cells]
+        change = np.where(self.flagged[boards, cells], -1, 1) * hidden
+        self.flagged[boards, cells] ^= hidden
+        self.number_of_flags[boards] += change
+        self.revealed[boards] += change
+        self.flagged_mines[boards] += change * self.bomb[boards, cells]
+        self.show_number[boards[:, None], self.dense[cells]] -= (change[:, None] * self.valid[cells]).astype(np.int8)
+
+    def left_click(self, boards:np.ndarray, cells:np.ndarray):
+        first = self.firstclick[boards]
+        if first.any():
+            self.decide_bombs(boards[first], cells[first])
+
+        rows, neighbours, valid = boards[:, None], self.dense[cells], self.valid[cells]
+        unflagged = valid & ~self.flagged[rows, neighbours]
+        chord = (self.number[boards, cells] != 0) & (self.show_number[boards, cells] == 0)
+        lost = (self.bomb[boards, cells] & ~self.flagged[boards, cells]) | (chord & (unflagged & self.bomb[rows, neighbours]).any(axis = 1))
+
+        # The clicked cell and, for a chord, its unflagged neighbours all start one flood fill
+        seeds = np.zeros((len(boards), self.size), dtype = bool)
+        seeds[np.arange(len(boards))[:, None], neighbours] = unflagged & chord[:, None]
+        seeds[np.arange(len(boards)), cells] = True
+        self.flood(boards, seeds)
+        if lost.any():
+            self.game_over(boards[lost])
+
+    def decide_bombs(self, boards:np.ndarray, cells:np.ndarray):
+        for board, cell in zip(boards.tolist(), cells.tolist()):
+            allowed = np.ones(self.size, dtype = bool)
+            allowed[cell] = False
+            allowed[self.dense[cell]] = False
+            rng = np.random.default_rng(int(self.seeds[board]))
+            self.bomb[board, rng.choice(np.flatnonzero(allowed), size = self.number_of_bombs, replace = False)] = True
+        self.flagged_mines[boards] = np.count_nonzero(self.bomb[boards] & self.flagged[boards], axis = 1)
+        self.number[boards] = self.neighbour_sum(self.bomb[boards])
+        self.show_number[boards] = self.number[boards] - self.neighbour_sum(self.flagged[boards])
+        self.firstclick[boards] = False
+
+    def flood(self, boards:np.ndarray, seeds:np.ndarray):
+        # Board.discover_neighbours from every seed at once: hidden safe cells are opened, and the flood carries on
+        # from the ones showing 0. Each round grows every board still spreading by one ring of cells.
+        openable = self.hidden[boards] & ~self.bomb[boards]
+        zero = self.show_number[boards] == 0
+        opened = seeds & openable
+        spreading = np.flatnonzero((opened & zero).any(axis = 1))
+        front = opened[spreading]
+        while len(spreading):
+            grown = self.spread(front & zero[spreading]) & openable[spreading] & ~opened[spreading]
+            opened[spreading] |= grown
+            more = (grown & zero[spreading]).any(axis = 1)
+            spreading, front = spreading[more], grown[more]
+
+        self.hidden[boards] &= ~opened
+        self.revealed_safe[boards] += np.count_nonzero(opened, axis = 1)
+        self.revealed[boards] += np.count_nonzero(opened & ~self.flagged[boards], axis = 1)
+
+    def game_over(self, boards:np.ndarray):
+        exposed = self.bomb[boards] & self.hidden[boards]
+        self.revealed[boards] += np.count_nonzero(exposed & ~self.flagged[boards], axis = 1)
+        self.hidden[boards] &= ~exposed
+        self.go[boards] = True
+
+class SpriteCache():
+
+    # Sprite sheets are loaded once per process, and the faces cut from them are kept scaled per (sheet, size).
+    # Only the most recently used sizes are kept, a new round on another map size pushes the oldest out.
+    directory = os.path.join(os.path.dirname(__file__), "Sprites")
+    limit = 8
+    sheets = {}
+    scaled = {}
+
+    @classmethod
+    def sheet(cls, name:str) -> pygame.Surface:
+        if name not in cls.sheets:
+            cls.sheets[name] = pygame.image.load(os.path.join(cls.directory, name)).convert_alpha()
+        return cls.sheets[name]
+
+    @classmethod
+    def faces(cls, name:str, frame:tuple[int, int], columns:int, count:int, size:tuple[float, float]) -> list[pygame.Surface]:
+        key = (name, tuple(size))
+        if key in cls.scaled:
+            cls.scaled[key] = cls.scaled.pop(key)
+            return cls.scaled[key]
+        sheet = cls.sheet(name)
+        faces = []
+        for i in range(count):
+            rect = pygame.Rect(i % columns * frame[0], i // columns * frame[1], *frame)
+            faces.append(pygame.transform.scale(sheet.subsurface(rect), size))
+        return cls.store(key, faces)
+
+    @classmethod
+    def image(cls, name:str, size:tuple[float, float] | None = None) -> pygame.Surface:
+        key = (name, None if size is None else tuple(size))
+        if key in cls.scaled:
+            cls.scaled[key] = cls.scaled.pop(key)
+            return cls.scaled[key]
+        image = cls.sheet(name)
+        return cls.store(key, image if size is None else pygame.transform.scale(image, size))
+
+    @classmethod
+    def store(cls, key:tuple, value):
+        cls.scaled[key] = value
+        while len(cls.scaled) > cls.limit:
+            del cls.scaled[next(iter(cls.scaled))]
+        return value
+
+    @classmethod
+    def tiles(cls, size:tuple[float, float]) -> list[pygame.Surface]:
+        return cls.faces("TILES ALL.png", (20, 20), 4, 12, size)
+
+    @classmethod
+    def numbers(cls, size:tuple[float, float]) -> list[pygame.Surface]:
+        return cls.faces("NUMBERS.png", (50, 100), 13, 13, size)
+
+    @classmethod
+    def warm(cls, screen_size:tuple[float, float], map_sizes:list[tuple[int, int]]):
+        # Scales the faces for every map size ahead of time, so starting a round does no image work
+        for map_size in map_sizes:
+            header_size, tile_size = Game.layout(screen_size, map_size)
+            cls.tiles(tile_size)
+        cls.numbers((int(header_size/2), header_size))
+
+class RenderQueue():
+
+    def __init__(self, screen:pygame.Surface, batched:bool = True):
+        self.screen = screen
+        self.batched = batched
+        self.dirty = []
+        self.frames = 0
+
+    def add(self, rect:pygame.Rect):
+        if self.batched:
+            self.dirty.append(rect)
+        else:
+            # Unbatched mode pushes every blit on its own, the way the game used to
+            pygame.display.flip()
+            self.frames += 1
+
+    def add_all(self):
+        self.add(self.screen.get_rect())
+
+    def flush(self):
+        if not self.dirty:
+            return
+        if len(self.dirty) > 64:
+            # Past a few dozen rects one bounding rect is cheaper than a long rect list
+            pygame.display.update(self.dirty[0].unionall(self.dirty))
+        else:
+            pygame.display.update(self.dirty)
+        self.dirty.clear()
+        self.frames += 1
+
+class Camera():
+
+    # Shows a board too big for the screen through a viewport that can be panned and zoomed.
+    # Tiles are drawn into chunk surfaces of about chunk_pixels square, the mine area is composed from the
+    # visible chunks, and only the most recently shown chunks are kept, so memory follows the viewport, not the board.
+    chunk_pixels = 256
+    min_tile = 4
+    max_tile = 64
+    background = (40, 40, 40)
+
+    def __init__(self, game:Game, tile:int):
+        self.game = game
+        self.board = game.board
+        self.screen = game.screen
+        self.area = pygame.Rect(0, game.header_size, game.screen_x, game.screen_y - game.header_size)
+        self.chunks = {}
+        # Board pixel shown at the top left of the area, starting on the middle of the board
+        width, height = self.board.map_size_in_tiles
+        self.x, self.y = (width * tile - self.area.width) // 2, (height * tile - self.area.height) // 2
+        self.set_tile(tile)
+
+    def set_tile(self, tile:int):
+        width, height = self.board.map_size_in_tiles
+        self.tile = tile
+        self.faces = SpriteCache.tiles((tile, tile))
+        self.chunk = max(1, self.chunk_pixels // tile)
+        self.chunks.clear()
+        span = self.chunk * tile
+        # Twice the chunks one view can touch, enough to pan back and forth without rebuilding
+        self.limit = 2 * (self.area.width // span + 2) * (self.area.height // span + 2)
+        self.clamp()
+
+    def clamp(self):
+        # A board smaller than the area is centred, a bigger one can't be scrolled past its edges
+        width, height = self.board.map_size_in_tiles
+        extent_x, extent_y = width * self.tile, height * self.tile
+        self.x = (extent_x - self.area.width) // 2 if extent_x <= self.area.width else min(max(0, self.x), extent_x - self.area.width)
+        self.y = (extent_y - self.area.height) // 2 if extent_y <= self.area.height else min(max(0, self.y), extent_y - self.area.height)
+
+    def pan(self, dx:int, dy:int):
+        x, y = self.x, self.y
+        self.x += dx
+        self.y += dy
+        self.clamp()
+        if (self.x, self.y) != (x, y):
+            self.draw()
+
+    def zoom(self, steps:int, anchor:tuple[int, int] | None = None):
+        # Each step scales the tiles by a quarter, keeping the board point under the anchor where it is
+        tile = min(self.max_tile, max(self.min_tile, round(self.tile * 1.25 ** steps)))
+        if tile == self.tile:
+            return
+        ax, ay = self.area.center if anchor is None else anchor
+        ay -= self.area.top
+        self.x = (self.x + ax) * tile // self.tile - ax
+        self.y = (self.y + ay) * tile // self.tile - ay
+        self.set_tile(tile)
+        self.draw()
+
+    def cell_at(self, x:float, y:float) -> int | None:
+        col, row = int(x + self.x) // self.tile, int(y - self.area.top + self.y) // self.tile
+        width, height = self.board.map_size_in_tiles
+        if 0 <= col < width and 0 <= row < height:
+            return self.board.cell(col, row)
+        return None
+
+    def tile_position(self, cell:int) -> tuple[int, int]:
+        x, y = self.board.coords(cell)
+        return x * self.tile - self.x, y * self.tile - self.y + self.area.top
+
+    def visible_chunks(self):
+        span = self.chunk * self.tile
+        width, height = self.board.map_size_in_tiles
+        columns, rows = -(-width // self.chunk), -(-height // self.chunk)
+        for cx in range(max(0, self.x // span), min(columns, (self.x + self.area.width - 1) // span + 1)):
+            for cy in range(max(0, self.y // span), min(rows, (self.y + self.area.height - 1) // span + 1)):
+                yield cx, cy
+
+    def build(self, cx:int, cy:int) -> pygame.Surface:
+        width, height = self.board.map_size_in_tiles
+        n, tile = self.chunk, self.tile
+        xs = np.arange(cx * n, min(width, (cx + 1) * n))
+        ys = np.arange(cy * n, min(height, (cy + 1) * n))
+        faces = self.board.face_indices((xs[:, None] * height + ys[None, :]).ravel())
+        surface = pygame.Surface((len(xs) * tile, len(ys) * tile))
+        lx = np.repeat((xs - cx * n) * tile, len(ys))
+        ly = np.tile((ys - cy * n) * tile, len(xs))
+        surface.blits([(self.faces[face], (x, y)) for face, x, y in zip(faces.tolist(), lx.tolist(), ly.tolist())], doreturn = False)
+        return surface
+
+    def draw(self):
+        # Composes the whole mine area from the visible chunks, building the ones that aren't cached
+        span = self.chunk * self.tile
+        self.screen.set_clip(self.area)
+        self.screen.fill(self.background, self.area)
+        for key in self.visible_chunks():
+            surface = self.chunks.pop(key, None)
+            if surface is None:
+                surface = self.build(*key)
+            self.chunks[key] = surface
+            self.screen.blit(surface, (key[0] * span - self.x, key[1] * span - self.y + self.area.top))
+        self.screen.set_clip(None)
+        while len(self.chunks) > self.limit:
+            del self.chunks[next(iter(self.chunks))]
+        self.game.render_queue.add(self.area)
+
+    def render(self, changes:list[int]):
+        if len(changes) > 4096:
+            # A big reveal: drop every chunk it touched and compose the area again
+            cells = np.unique(np.asarray(changes))
+            height = self.board.map_size_in_tiles[1]
+            for key in set(zip((cells // height // self.chunk).tolist(), (cells % height // self.chunk).tolist())):
+                self.chunks.pop(key, None)
+            self.draw()
+            return
+        n, tile = self.chunk, self.tile
+        self.screen.set_clip(self.area)
+        for cell in set(changes):
+            x, y = self.board.coords(cell)
+            face = self.faces[self.board.face_index(cell)]
+            # Cached chunks are patched in place, whether or not they are on screen
+            surface = self.chunks.get((x // n, y // n))
+            if surface is not None:
+                surface.blit(face, (x % n * tile, y % n * tile))
+            rect = self.screen.blit(face, (x * tile - self.x, y * tile - self.y + self.area.top))
+            if rect.width and rect.height:
+                self.game.render_queue.add(rect)
+        self.screen.set_clip(None)
 
-    def __str__(self) -> str:
-        return f"Tile {self.show_number} at position {self.map_x}, {self.map_y}. Hidden: {self.hidden}. Flagged: {self.flagged}. Bomb: {self.bomb}"
-    
 class Figure():
 
     def __init__(self, header:Header, x:int, y:int, face:pygame.surface):
@@ -117,8 +872,7 @@ class Figure():
         if type(new_face) == str:
             new_face = transform[new_face]
         self.face = self.header.numbers[new_face]
-        self.master.screen.blit(self.face, (self.screen_x, self.screen_y))
-        pygame.display.flip()
+        self.master.render_queue.add(self.master.screen.blit(self.face, (self.screen_x, self.screen_y)))
 
 class Header():
 
@@ -126,18 +880,9 @@ class Header():
         self.master = master
         self.max_time = master.max_time
         self.size = self.master.header_size
-        directory = os.path.join(os.path.dirname(__file__), "Sprites")
-        tilesheet = pygame.image.load(os.path.join(directory, "NUMBERS.png")).convert_alpha()
 
-        original_ts = 50
         ts = int(self.size/2)
-        self.numbers = []
-        for i in range(13):
-            rect = pygame.Rect(i*original_ts, 0, original_ts, original_ts*2)
-            number_surface = pygame.Surface((original_ts, original_ts*2), pygame.SRCALPHA)
-            number_surface.blit(tilesheet, (0, 0), rect)
-            number_surface = pygame.transform.scale(number_surface, (ts, self.size))
-            self.numbers.append(number_surface)
+        self.numbers = SpriteCache.numbers((ts, self.size))
         self.master.screen.blit(self.numbers[11], (self.master.screen_x - ts, 0))
         self.master.screen.blit(self.numbers[11], (0, 0))
         
@@ -161,8 +906,11 @@ class Header():
         self.score_rect = self.score_message.get_rect(center = ((ts * 6 + (self.master.screen_x - (ts * (len(self.figures) + 1))))/2, ts))
         self.master.screen.blit(self.score_message, self.score_rect)
 
+        # Last values drawn, so redraws only happen when what is shown actually changes
+        self.shown_time = None
+        self.shown_bombs = None
+        self.shown_score = None
         self.update_header()
-        pygame.display.flip()
     
     def update_header(self):
         self.update_time()
@@ -170,7 +918,11 @@ class Header():
         self.update_score()
     
     def update_bomb_number(self):
-        remaining = str(self.master.number_of_bombs - self.master.number_of_flags)
+        remaining = self.master.number_of_bombs - self.master.number_of_flags
+        if remaining == self.shown_bombs:
+            return
+        self.shown_bombs = remaining
+        remaining = str(remaining)
         for i in range(len(remaining)):
             self.figures[i].update_face(remaining[i])
         i += 1
@@ -189,89 +941,643 @@ class Header():
             # Clamp to 5 digits max
             time = min(self.elapsed_seconds, 99999)
         else:
-            time = self.max_time - self.elapsed_seconds
+            # A turbo solve blocks the clock, so the limit may already be behind it here
+            time = max(self.max_time - self.elapsed_seconds, 0)
 
-        str_time = str(time)[::-1]
+        if time != self.shown_time:
+            self.shown_time = time
+            str_time = str(time)[::-1]
 
-        # Update the 5 clock digits
-        for i in range(len(str_time)):
-            self.clock[i].update_face(str_time[i])
-        
-        i += 1
-        while i in range(len(self.clock)):
-            self.clock[i].update_face(10)
+            # Update the 5 clock digits
+            for i in range(len(str_time)):
+                self.clock[i].update_face(str_time[i])
+            
             i += 1
+            while i in range(len(self.clock)):
+                self.clock[i].update_face(10)
+                i += 1
         
-        if time == 0 and self.master.start_time is not None and self.max_time > 0:
+        if time <= 0 and self.master.start_time is not None and self.max_time > 0 and not self.master.go and not self.master.won:
             self.master.game_over()
 
     def update_score(self):
+        score = self.master.score
+        if score == self.shown_score:
+            return
+        self.shown_score = score
         self.master.screen.fill((127, 127, 127), self.score_rect)
+        self.master.render_queue.add(self.score_rect)
         ts = int(self.master.header_size/2)
-        self.score_message = self.score_font.render(f"SCORE: {self.master.score}", True, (255, 36, 7))
+        self.score_message = self.score_font.render(f"SCORE: {score}", True, (255, 36, 7))
         self.score_rect = self.score_message.get_rect(center = ((ts * 6 + (self.master.screen_x - (ts * (len(self.figures) + 1))))/2, ts))
-        self.master.screen.blit(self.score_message, self.score_rect)
+        self.master.render_queue.add(self.master.screen.blit(self.score_message, self.score_rect))
         
+class BitBoard():
+
+    # Cell sets around a constraint cell as bits: a 3x3 window is 9 bits, and a pair of constraints up to
+    # distance 2 apart fits in a 7x7 frame of 49 bits, so one uint64 holds either set whatever the board size.
+
+    # Embedding of every 3x3 window mask into the frame, per offset of the window centre (built once)
+    frame_tables = None
+    # Set bits of every byte value, for popcounts over uint64 arrays
+    byte_counts = np.array([bin(i).count("1") for i in range(256)], dtype = np.int64)
+
+    def __init__(self, board:Board):
+        self.board = board
+        self.height = board.height
+        # Frame bit (dx + 3) * 7 + (dy + 3) sits at this cell offset from the frame centre
+        self.frame_delta = [(p // 7 - 3) * board.height + (p % 7 - 3) for p in range(49)]
+        if BitBoard.frame_tables is None:
+            BitBoard.frame_tables = self.build_frame_tables()
+
+    @staticmethod
+    def build_frame_tables() -> np.ndarray:
+        # frame_tables[(dx + 2) * 5 + (dy + 2), window] places a 3x3 window centred at (dx, dy) in the frame
+        tables = np.zeros((25, 512), dtype = np.uint64)
+        for dx in range(-2, 3):
+            for dy in range(-2, 3):
+                for k in range(9):
+                    bit = np.uint64(1 << ((dx + k // 3 + 2) * 7 + (dy + k % 3 + 2)))
+                    rows = (np.arange(512) >> k & 1).astype(bool)
+                    tables[(dx + 2) * 5 + (dy + 2), rows] |= bit
+        return tables
+
+    def popcount(self, frames:np.ndarray) -> np.ndarray:
+        return self.byte_counts[frames.view(np.uint8)].reshape(-1, 8).sum(axis = 1)
+
+    def windows(self, cells:list[int], mask:np.ndarray) -> np.ndarray:
+        # 9-bit mask of the 3x3 window around every cell, bit (dx + 1) * 3 + (dy + 1)
+        grid = np.pad(mask.reshape(self.board.map_size_in_tiles), 1)
+        xs, ys = np.divmod(np.asarray(cells, dtype = np.intp), self.height)
+        windows = np.zeros(len(cells), dtype = np.int64)
+        for k in range(9):
+            windows |= grid[xs + k // 3, ys + k % 3].astype(np.int64) << k
+        return windows
+
+    def frame_cells(self, centre:int, frame:int) -> list[int]:
+        cells = []
+        while frame:
+            low = frame & -frame
+            cells.append(centre + self.frame_delta[low.bit_length() - 1])
+            frame ^= low
+        return cells
+
+class ConstraintSolver():
+
+    def __init__(self, constraints:list[tuple[list[int], int]], n:int):
+        # Variables are 0..n-1, each constraint says exactly `number` of the variables in its scope are mines
+        self.n = n
+        self.scopes = [list(scope) for scope, _ in constraints]
+        self.targets = [int(number) for _, number in constraints]
+        self.var_constraints = [[] for _ in range(n)]
+        for c, scope in enumerate(self.scopes):
+            for v in scope:
+                self.var_constraints[v].append(c)
+        self.reset()
+
+    def reset(self):
+        self.value = [-1] * self.n
+        self.remaining = list(self.targets)
+        self.free = [len(scope) for scope in self.scopes]
+        self.trail = []
+
+    def assign(self, v:int, val:int, queue:list) -> bool:
+        self.value[v] = val
+        self.trail.append(v)
+        ok = True
+        for c in self.var_constraints[v]:
+            self.free[c] -= 1
+            self.remaining[c] -= val
+            if self.remaining[c] < 0 or self.remaining[c] > self.free[c]:
+                ok = False
+            queue.append(c)
+        return ok
+
+    def undo(self, mark:int):
+        while len(self.trail) > mark:
+            v = self.trail.pop()
+            val = self.value[v]
+            self.value[v] = -1
+            for c in self.var_constraints[v]:
+                self.free[c] += 1
+                self.remaining[c] += val
+
+    def propagate(self, queue:list) -> bool:
+        # Unit propagation: a constraint with no mines left or with as many mines left as free cells decides its scope
+        while queue:
+            c = queue.pop()
+            remaining, free = self.remaining[c], self.free[c]
+            if remaining < 0 or remaining > free:
+                return False
+            if free == 0 or 0 < remaining < free:
+                continue
+            val = 1 if remaining == free else 0
+            for v in self.scopes[c]:
+                if self.value[v] == -1 and not self.assign(v, val, queue):
+                    return False
+        return True
+
+    def choose(self) -> int | None:
+        # Branch inside the tightest open constraint, where a wrong guess is found soonest
+        best, best_free = None, None
+        for c, free in enumerate(self.free):
+            if free and (best_free is None or free < best_free):
+                best, best_free = c, free
+                if free == 1:
+                    break
+        if best is None:
+            return None
+        for v in self.scopes[best]:
+            if self.value[v] == -1:
+                return v
+
+    def search(self) -> bool:
+        # Depth-first search with an explicit stack of [variable, trail mark, values tried]
+        stack = []
+        v = self.choose()
+        while v is not None:
+            stack.append([v, len(self.trail), 0])
+            while True:
+                if not stack:
+                    return False
+                frame = stack[-1]
+                self.undo(frame[1])
+                if frame[2] == 2:
+                    stack.pop()
+                    continue
+                val = frame[2]
+                frame[2] += 1
+                queue = []
+                if self.assign(frame[0], val, queue) and self.propagate(queue):
+                    break
+            v = self.choose()
+        return True
+
+    def solve(self) -> tuple[list[int], list[int]] | None:
+        # Returns the variables that are safe and the ones that are mines in every solution, or None if there is none
+        self.reset()
+        if not self.propagate(list(range(len(self.scopes)))):
+            return None
+        root = len(self.trail)
+        if not self.search():
+            return None
+        # Variables outside every constraint can be either, so they start out seen both ways
+        seen_safe = [val == 0 or not self.var_constraints[v] for v, val in enumerate(self.value)]
+        seen_mine = [val == 1 or not self.var_constraints[v] for v, val in enumerate(self.value)]
+        self.undo(root)
+
+        for v in range(self.n):
+            if self.value[v] != -1 or (seen_safe[v] and seen_mine[v]):
+                continue
+            val = 0 if seen_mine[v] else 1
+            queue = []
+            if self.assign(v, val, queue) and self.propagate(queue) and self.search():
+                for u, found in enumerate(self.value):
+                    if found == 0:
+                        seen_safe[u] = True
+                    elif found == 1:
+                        seen_mine[u] = True
+                self.undo(root)
+            else:
+                # v can only take its other value, so fix it at the root to tighten every later search
+                self.undo(root)
+                queue = []
+                self.assign(v, 1 - val, queue)
+                self.propagate(queue)
+                root = len(self.trail)
+
+        safe = [v for v in range(self.n) if not seen_mine[v]]
+        mines = [v for v in range(self.n) if not seen_safe[v]]
+        return safe, mines
+
+def poly_add(a:list[int], b:list[int]) -> list[int]:
+    if len(a) < len(b):
+        a, b = b, a
+    result = list(a)
+    for k, value in enumerate(b):
+        result[k] += value
+    return result
+
+def poly_mul(a:list[int], b:list[int]) -> list[int]:
+    if not a or not b:
+        return []
+    result = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                result[i + j] += x * y
+    return result
+
+class MineCounter():
+
+    # Counts the mine placements of a constraint system by number of mines, with the same counts for
+    # every cell being a mine. Polynomials are coefficient lists: poly[k] is the number of solutions
+    # with k mines. Systems are frozensets of (frozenset(cells), number), so every sub-system met while
+    # branching is memoized and unchanged frontier components are free on the next move.
+    def __init__(self, limit:int = 50000):
+        self.limit = limit
+        self.cache = {}
+
+    def count(self, system:frozenset) -> tuple[list[int], dict[int, list[int]]]:
+        if system in self.cache:
+            return self.cache[system]
+        reduced = self.reduce(system)
+        if reduced is None:
+            return self.store(system, ([], {}))
+        fixed, groups = reduced
+
+        # Count the groups that share no cells on their own and multiply them together
+        poly, marginals = [1], {}
+        for group in groups:
+            group_poly, group_marginals = self.count_connected(frozenset(group))
+            marginals = {v: poly_mul(m, group_poly) for v, m in marginals.items()}
+            marginals.update({v: poly_mul(poly, m) for v, m in group_marginals.items()})
+            poly = poly_mul(poly, group_poly)
+
+        mines = sum(fixed.values())
+        if mines:
+            poly = [0] * mines + poly
+            marginals = {v: [0] * mines + m for v, m in marginals.items()}
+        for v, val in fixed.items():
+            if val:
+                marginals[v] = poly
+        return self.store(system, (poly, marginals))
+
+    def reduce(self, system:frozenset) -> tuple[dict[int, int], list[list[tuple[frozenset, int]]]] | None:
+        # Unit propagation: constraints with no mines left or only mines left fix their cells.
+        # Returns the fixed cells and the rest split into groups that share no cells, or None on a contradiction.
+        fixed = {}
+        constraints = list(system)
+        changed = True
+        while changed:
+            changed = False
+            remaining = []
+            for scope, number in constraints:
+                if any(v in fixed for v in scope):
+                    number -= sum(fixed[v] for v in scope if v in fixed)
+                    scope = frozenset(v for v in scope if v not in fixed)
+                if number < 0 or number > len(scope):
+                    return None
+                if not scope:
+                    continue
+                if number == 0 or number == len(scope):
+                    for v in scope:
+                        fixed[v] = 1 if number else 0
+                    changed = True
+                    continue
+                remaining.append((scope, number))
+            constraints = remaining
+        return fixed, self.split(constraints)
+
+    def count_connected(self, system:frozenset) -> tuple[list[int], dict[int, list[int]]]:
+        if system in self.cache:
+            return self.cache[system]
+        occurrences = {}
+        for scope, _ in system:
+            for v in scope:
+                occurrences[v] = occurrences.get(v, 0) + 1
+        branch = max(occurrences, key = occurrences.get)
+
+        # poly = poly(branch safe) + x * poly(branch mine), and the same for every marginal
+        safe_poly, safe_marginals = self.count(self.substitute(system, branch, 0))
+        mine_poly, mine_marginals = self.count(self.substitute(system, branch, 1))
+        mine_poly = [0] + mine_poly if mine_poly else []
+        poly = poly_add(safe_poly, mine_poly)
+        marginals = dict(safe_marginals)
+        for v, m in mine_marginals.items():
+            marginals[v] = poly_add(marginals.get(v, []), [0] + m)
+        if mine_poly:
+            marginals[branch] = mine_poly
+        return self.store(system, (poly, marginals))
+
+    def substitute(self, system:frozenset, cell:int, val:int) -> frozenset:
+        return frozenset((scope - {cell}, number - val) if cell in scope else (scope, number)
+                         for scope, number in system)
+
+    def split(self, constraints:list[tuple[frozenset, int]]) -> list[list[tuple[frozenset, int]]]:
+        # Union-find over cells, constraints end up grouped by the root of their first cell
+        parent = {}
+        def find(v:int) -> int:
+            while parent[v] != v:
+                parent[v] = parent[parent[v]]
+                v = parent[v]
+            return v
+
+        for scope, _ in constraints:
+            root = None
+            for v in scope:
+                parent.setdefault(v, v)
+                if root is None:
+                    root = find(v)
+                else:
+                    parent[find(v)] = root
+        groups = {}
+        for constraint in constraints:
+            groups.setdefault(find(next(iter(constraint[0]))), []).append(constraint)
+        return list(groups.values())
+
+    def store(self, system:frozenset, result:tuple) -> tuple:
+        if len(self.cache) >= self.limit:
+            self.cache.clear()
+        self.cache[system] = result
+        return result
+
+class PatternCache():
+
+    # Solved frontier components keyed by their shape alone: the numbers and unknown cells relative to each other,
+    # in whichever of the 8 rotations and reflections sorts first. Results are stored in that frame, so a 1-2-1
+    # solved once is solved wherever and however it turns up again. The least recently used entries go first.
+    transforms = ((1, 0, 0, 1), (-1, 0, 0, 1), (1, 0, 0, -1), (-1, 0, 0, -1),
+                  (0, 1, 1, 0), (0, -1, 1, 0), (0, 1, -1, 0), (0, -1, -1, 0))
+
+    def __init__(self, limit:int = 20000, largest:int = 64):
+        self.limit = limit
+        # Bigger components practically never repeat, they are solved without being cached
+        self.largest = largest
+        self.entries = {}
+        self.counter = MineCounter()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def canonical(self, board:Board, sources:list[tuple[int, int]], cells:list[int]) -> tuple[tuple, dict[tuple[int, int], int]]:
+        # The smallest sorted point list over all orientations, and where every unknown cell lands in it
+        points = [(*board.coords(cell), number) for cell, number in sources] + [(*board.coords(cell), -1) for cell in cells]
+        best = None
+        for a, b, c, d in self.transforms:
+            moved = [(a * x + b * y, c * x + d * y, v) for x, y, v in points]
+            left = min(x for x, _, _ in moved)
+            top = min(y for _, y, _ in moved)
+            moved = [(x - left, y - top, v) for x, y, v in moved]
+            key = tuple(sorted(moved))
+            if best is None or key < best[0]:
+                best = (key, moved)
+        key, moved = best
+        return key, {(x, y): cell for (x, y, _), cell in zip(moved[len(sources):], cells)}
+
+    def solve(self, board:Board, sources:list[tuple[int, int]], cells:list[int],
+              constraints:list[tuple[list[int], int]]) -> tuple[list[int], list[int]] | None:
+        # Safe and mine cells of one component, like ConstraintSolver.solve but as board cells
+        if len(sources) + len(cells) > self.largest:
+            result = ConstraintSolver(constraints, len(cells)).solve()
+            return None if result is None else ([cells[v] for v in result[0]], [cells[v] for v in result[1]])
+
+        key, frame = self.canonical(board, sources, cells)
+        # Background solvers and a turbo solve on the main thread can share the cache, and its counter, at once
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                entry = self.entries[key] = self.entries.pop(key)
+            else:
+                self.misses += 1
+                entry = None
+                # Counting the solutions by number of mines also tells which cells are a mine in none or in all of them
+                counts, marginals = self.counter.count(frozenset((frozenset(scope), number) for scope, number in constraints))
+                total = sum(counts)
+                if total:
+                    position = {cell: point for point, cell in frame.items()}
+                    mines = {v: sum(marginals.get(v, ())) for v in range(len(cells))}
+                    entry = (tuple(position[cells[v]] for v, m in mines.items() if m == 0),
+                             tuple(position[cells[v]] for v, m in mines.items() if m == total), tuple(counts))
+                self.entries[key] = entry
+                while len(self.entries) > self.limit:
+                    del self.entries[next(iter(self.entries))]
+        if entry is None:
+            return None
+        safe, mines, _ = entry
+        return [frame[point] for point in safe], [frame[point] for point in mines]
+
+    def stats(self) -> dict:
+        looked_up = self.hits + self.misses
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / looked_up if looked_up else 0.0}
+
+    def save(self, path:str):
+        with self.lock, open(path, "wb") as f:
+            pickle.dump(self.entries, f, protocol = pickle.HIGHEST_PROTOCOL)
+
+    def load(self, path:str):
+        # Entries already in memory count as more recent than the ones read back
+        with open(path, "rb") as f:
+            entries = pickle.load(f)
+        with self.lock:
+            entries.update(self.entries)
+            self.entries = entries
+            while len(self.entries) > self.limit:
+                del self.entries[next(iter(self.entries))]
+
 class Automation():
 
-    def __init__(self, master:Game):
+    # Shared by every solver in the process, so shapes learned in one game carry over to the next
+    patterns = PatternCache()
+
+    def __init__(self, master:Game|Board, bitsets:bool = False):
         self.master = master
-        self.frontier = master.frontier
-    
-    def automate(self):
-        can_automate = True
-        easy_automation = True
-        while can_automate and not self.master.go:
-                can_automate = False
-                while easy_automation:
-                    easy_automation = False
-                    self.check_completed()
-                    easy_automation = self.equal_spaces_as_mines()
-                    easy_automation |= self.pair_constraint_logic()
-                can_automate = self.hard_constraints_logic()
+        self.board = master if isinstance(master, Board) else master.board
+        # Opt-in bitboard backend for the pair logic
+        self.bitboard = BitBoard(self.board) if bitsets else None
+        self.counter = MineCounter()
+        self.guesses = 0
+        # Cells each phase still has to look at: every cell a reveal or flag touched, and its neighbours.
+        # None means the whole board, which is where every phase starts. The board is only watched from the
+        # first phase run on, so an Automation that is never used doesn't collect every change of the game.
+        self.changes = None
+        self.queues = dict.fromkeys(("completed", "equal", "pair", "hard"))
+
+    def touched(self, phase:str) -> set[int] | None:
+        if self.changes is None:
+            self.changes = self.board.watch()
+        elif self.changes:
+            cells = set(self.changes)
+            self.changes.clear()
+            for cell in list(cells):
+                cells.update(self.board.neighbours[cell])
+            for queue in self.queues.values():
+                if queue is not None:
+                    queue |= cells
+        cells = self.queues[phase]
+        self.queues[phase] = set()
+        return cells
+
+    def automate(self, guess:bool = False):
+        self.board.record("G" if guess else "A")
+        self.board.solving = True
+        try:
+            self.solve(guess)
+        finally:
+            self.board.solving = False
+
+    def solve(self, guess:bool):
+        while not self.board.go and not self.board.won:
+            can_automate = True
+            while can_automate and not self.board.go:
+                    # The easy phases run again after every hard step, they only look at what it touched
+                    easy_automation = True
+                    while easy_automation and not self.board.go:
+                        self.check_completed()
+                        easy_automation = self.equal_spaces_as_mines()
+                        easy_automation |= self.pair_constraint_logic()
+                    can_automate = self.hard_constraints_logic()
+
+            # Out of certain moves: stop, or take the cell least likely to be a mine and carry on
+            if not guess or self.board.go or self.board.won:
+                break
+            cell = self.best_guess()
+            if cell is None:
+                break
+            self.guesses += 1
+            self.master.left_click_handler(cell)
+
+    def probabilities(self) -> np.ndarray | None:
+        # Exact mine probability of every cell given what is shown. Frontier components are counted by
+        # number of mines and weighted by the ways to place the remaining mines on the other hidden cells.
+        board = self.board
+        system = []
+        # Every revealed cell next to a free cell constrains it, including completed ones that left the frontier
+        unknown = board.hidden & ~board.flagged
+        for cell in np.flatnonzero(~board.hidden & (board.neighbour_sum(unknown) > 0)):
+            system.append((frozenset(board.free_neighbours(cell)), int(board.show_number[cell])))
+        constrained = set().union(*(scope for scope, _ in system))
+        reduced = self.counter.reduce(frozenset(system))
+        if reduced is None:
+            # What is shown cannot happen, which only comes from wrong flags
+            return None
+        fixed, groups = reduced
+        # Exact counts grow past what a float holds, and exact binomials of a big board's outside cells take
+        # seconds, so both are floats relative to their largest term. A group's scale cancels out of its own
+        # probabilities, and every row below is rescaled the same way so nothing over- or underflows.
+        counted = []
+        for group in groups:
+            poly, marginals = self.counter.count_connected(frozenset(group))
+            largest = max(poly, default = 0) or 1
+            counted.append(([p / largest for p in poly], {v: [m / largest for m in marginal] for v, marginal in marginals.items()}))
+
+        outside = int(np.count_nonzero(unknown)) - len(constrained)
+        remaining = board.number_of_bombs - board.number_of_flags - sum(fixed.values())
+        most = sum(len(poly) - 1 for poly, _ in counted)
+        # weight[t]: ways to place the other mines outside every group when t mines are in the groups
+        logs = [lgamma(outside + 1) - lgamma(remaining - t + 1) - lgamma(outside - remaining + t + 1)
+                if 0 <= remaining - t <= outside else -inf for t in range(most + 1)]
+        top = max(logs)
+        if top == -inf:
+            return None
+        weight = [exp(log - top) for log in logs]
+        # after[i][t]: ways to finish the board when t mines went to groups before i, summed over groups i onward
+        after = [weight]
+        for poly, _ in reversed(counted):
+            following = after[-1]
+            row = [sum(p * following[t + k] for k, p in enumerate(poly) if t + k <= most) for t in range(most + 1)]
+            scale = max(row) or 1.0
+            after.append([w / scale for w in row])
+        after.reverse()
+        if after[0][0] == 0:
+            return None
+
+        probability = np.zeros(board.size)
+        probability[board.flagged] = 1.0
+        before = [1.0]
+        for i, (poly, marginals) in enumerate(counted):
+            # seen[j]: weight of the rest of the board when this group holds j mines
+            seen = [sum(b * after[i + 1][a + j] for a, b in enumerate(before) if a + j <= most) for j in range(len(poly))]
+            total = sum(p * w for p, w in zip(poly, seen))
+            for cell, marginal in marginals.items():
+                probability[cell] = sum(m * w for m, w in zip(marginal, seen)) / total
+            before = poly_mul(before, poly)
+            scale = max(before) or 1.0
+            before = [b / scale for b in before]
+        for cell, val in fixed.items():
+            probability[cell] = val
+        for cell in constrained - fixed.keys() - set().union(*(marginals for _, marginals in counted)):
+            probability[cell] = 0.0
+
+        if outside:
+            total = sum(b * w for b, w in zip(before, weight))
+            interior = sum(b * w * (remaining - t) for t, (b, w) in enumerate(zip(before, weight)))
+            unconstrained = unknown.copy()
+            unconstrained[list(constrained)] = False
+            probability[unconstrained] = interior / (total * outside)
+        return probability
+
+    def best_guess(self) -> int | None:
+        probability = self.probabilities()
+        unknown = np.flatnonzero(self.board.hidden & ~self.board.flagged)
+        if probability is None or len(unknown) == 0:
+            return None
+        return int(unknown[np.argmin(probability[unknown])])
                 
     def check_completed(self):
-        for tile in self.master.flat:
-            if self.master.go: break
-            if not tile.hidden and tile.show_number == 0 and tile.number != 0:
-                self.master.left_click_handler(tile)
+        # Chord click every revealed cell whose mines are all flagged and that still has hidden neighbours
+        board = self.board
+        cells = self.touched("completed")
+        cells = np.arange(board.size) if cells is None else np.fromiter(cells, dtype = np.intp, count = len(cells))
+        completed = cells[~board.hidden[cells] & (board.show_number[cells] == 0) & (board.number[cells] != 0)]
+        for cell in completed.tolist():
+            if board.go: break
+            if board.free_neighbours(cell):
+                self.master.left_click_handler(cell)
 
     def equal_spaces_as_mines(self) -> bool:
         easy = False
-        for tile in self.master.frontier:
-            if self.master.go: break
-            free_neighbours = [n for n in tile.neighbours if n.hidden and not n.flagged]
-            if len(free_neighbours) == tile.show_number:
+        cells = self.touched("equal")
+        frontier = list(self.board.frontier) if cells is None else [cell for cell in cells if cell in self.board.frontier]
+        for cell in frontier:
+            if self.board.go: break
+            free_neighbours = self.board.free_neighbours(cell)
+            if free_neighbours and len(free_neighbours) == self.board.show_number[cell]:
                 easy = True
                 for n in free_neighbours:
                     self.master.right_click_handler(n)
         return easy
     
     def pair_constraint_logic(self) -> bool:
-        constraints = []
+        to_be_flagged, to_be_clicked = self.pair_deductions(self.touched("pair"))
+        for cell in to_be_flagged:
+            self.master.right_click_handler(cell)
+        for cell in to_be_clicked:
+            self.master.left_click_handler(cell)
+            if self.board.go: break
+        return bool(to_be_flagged or to_be_clicked)
+
+    def pair_cells(self, cells:set[int] | None) -> tuple[list[int], set[int]]:
+        # Frontier cells whose pairs need checking, and every frontier cell that can pair with one of them
+        frontier = self.board.frontier
+        if cells is None:
+            return list(frontier), set(frontier)
+        sources = [cell for cell in cells if cell in frontier]
+        around = set(sources)
+        for cell in sources:
+            around.update(n for n in self.board.neighbourhood[cell] if n in frontier)
+        return sources, around
+
+    def pair_deductions(self, cells:set[int] | None = None) -> tuple[set[int], set[int]]:
+        # Pairs of constraints where at least one is in cells, or every pair when cells is None
+        if self.bitboard is not None:
+            return self.pair_deductions_bitset(cells)
+        sources, around = self.pair_cells(cells)
+        constraints = {}
         to_be_flagged = set()
         to_be_clicked = set()
-        easy = False
-        for tile in self.master.frontier:
-            if tile.free_neighbours:
-                constraints.append((set(tile.free_neighbours), tile.show_number, tile))
-
-        for i in range(len(constraints)):
-            UA, MA, A = constraints[i]
-            for j in range(len(constraints)):
-                if i == j:
-                    continue
-                UB, MB, B = constraints[j]
-
-                if A not in B.neighbours:
+        for cell in around:
+            free_neighbours = self.board.free_neighbours(cell)
+            if free_neighbours:
+                constraints[cell] = (frozenset(free_neighbours), int(self.board.show_number[cell]))
+        sources = set(sources)
+
+        # Only constraints within distance 2 can share unknown cells, so pairs come from the neighbourhood index
+        for A in sources:
+            if A not in constraints:
+                continue
+            UA, MA = constraints[A]
+            for B in self.board.neighbourhood[A]:
+                if B not in constraints or (B < A and B in sources):
                     continue
+                UB, MB = constraints[B]
 
                 common = UA & UB
-                only_A = UA - UB
-                only_B = UB - UA
-
-                if not common and not only_A and not only_B:
+                if not common:
                     continue
+                only_A = UA - common
+                only_B = UB - common
 
                 y_min = max(0, MA - len(only_A), MB - len(only_B))
                 y_max = min(len(common), MA, MB)
@@ -281,275 +1587,691 @@ class Automation():
                     x = MA - y
                     z = MB - y
                     if x == 0:
-                        for cell in only_A:
-                            to_be_clicked.add(cell)
-                            easy = True
+                        to_be_clicked.update(only_A)
                     elif x == len(only_A):
-                        for cell in only_A:
-                            to_be_flagged.add(cell)
-                            easy = True
+                        to_be_flagged.update(only_A)
 
                     if z == 0:
-                        for cell in only_B:
-                            to_be_clicked.add(cell)
-                            easy = True
+                        to_be_clicked.update(only_B)
                     elif z == len(only_B):
-                        for cell in only_B:
-                            to_be_flagged.add(cell)
-                            easy = True
+                        to_be_flagged.update(only_B)
 
-        for cell in to_be_flagged:
-            self.master.right_click_handler(cell)
-        for cell in to_be_clicked:
-            self.master.left_click_handler(cell)
-            if self.master.go: break
-        return easy
+        return to_be_flagged, to_be_clicked
+
+    def pair_deductions_bitset(self, cells:set[int] | None = None) -> tuple[set[int], set[int]]:
+        # Same deductions as pair_deductions. Both unknown sets of a pair are placed in a 7x7 frame around A,
+        # one uint64 per pair, and every pair at a given offset is checked at once with array operations.
+        board, bits = self.board, self.bitboard
+        to_be_flagged = set()
+        to_be_clicked = set()
+        sources, around = self.pair_cells(cells)
+        frontier = np.fromiter(around, dtype = np.intp, count = len(around))
+        windows = bits.windows(frontier, board.hidden & ~board.flagged)
+        frontier, windows = frontier[windows != 0], windows[windows != 0]
+        source = np.zeros(board.size, dtype = bool)
+        source[sources] = True
+        mines = board.show_number[frontier].astype(np.int64)
+        slot = np.full(board.size, -1, dtype = np.intp)
+        slot[frontier] = np.arange(len(frontier))
+        xs, ys = np.divmod(frontier, bits.height)
+
+        # Every constraint B within distance 2 after a constraint A, so each pair is seen once
+        pairs_A, pairs_B, offsets = [], [], []
+        for dx in range(3):
+            for dy in range(-2, 3):
+                if dx == 0 and dy <= 0:
+                    continue
+                bx, by = xs + dx, ys + dy
+                A = np.flatnonzero((bx < board.width) & (by >= 0) & (by < bits.height))
+                B = slot[bx[A] * bits.height + by[A]]
+                pairs_A.append(A[B >= 0])
+                pairs_B.append(B[B >= 0])
+                offsets.append(np.full(len(pairs_B[-1]), (dx + 2) * 5 + (dy + 2)))
+        A, B, offsets = np.concatenate(pairs_A), np.concatenate(pairs_B), np.concatenate(offsets)
+        wanted = source[frontier[A]] | source[frontier[B]]
+        A, B, offsets = A[wanted], B[wanted], offsets[wanted]
+
+        UA = bits.frame_tables[12, windows[A]]
+        UB = bits.frame_tables[offsets, windows[B]]
+        common = UA & UB
+        shared = common != 0
+        A, B, UA, UB, common = A[shared], B[shared], UA[shared], UB[shared], common[shared]
+        only_A = UA ^ common
+        only_B = UB ^ common
+        size_A, size_B = bits.popcount(only_A), bits.popcount(only_B)
+
+        MA, MB = mines[A], mines[B]
+        y_min = np.maximum(0, np.maximum(MA - size_A, MB - size_B))
+        y_max = np.minimum(bits.popcount(common), np.minimum(MA, MB))
+        decided = y_min == y_max
+        x = MA - y_min
+        z = MB - y_min
+
+        for rows, frames, target in ((decided & (x == 0), only_A, to_be_clicked),
+                                     (decided & (x != 0) & (x == size_A), only_A, to_be_flagged),
+                                     (decided & (z == 0), only_B, to_be_clicked),
+                                     (decided & (z != 0) & (z == size_B), only_B, to_be_flagged)):
+            for centre, frame in zip(frontier[A[rows]].tolist(), frames[rows].tolist()):
+                target.update(bits.frame_cells(centre, frame))
+
+        return to_be_flagged, to_be_clicked
 
     def hard_constraints_logic(self) -> bool:
-        frontier = [tile for tile in self.master.frontier if tile.free_neighbours]
-        if not frontier:
+        touched = self.touched("hard")
+        if not self.board.frontier:
             return False
 
-        # Divide frontier into connected components
+        # Divide frontier into connected components, only the ones a move touched since the last pass can
+        # have anything new to give
         components = self.divide_frontier_into_components()
+        if touched is not None:
+            components = [component for component in components if not touched.isdisjoint(component)]
         made_progress = False
 
         for component in components:
-            tiles_in_component = set()
-            tile_constraints = []
-
-            # Collect all free neighbors and constraints
-            for tile in component:
-                free_neighbors = set(tile.free_neighbours)
-                if free_neighbors:
-                    tiles_in_component.update(free_neighbors)
-                    tile_constraints.append((free_neighbors, tile.show_number))
-
-            tiles_in_component = list(tiles_in_component)
-            n = len(tiles_in_component)
-            if n == 0 or n >= 12:
+            cells, constraints = self.component_constraints(component)
+            if not cells:
                 continue
 
-            # Generate all valid bomb placements
-            valid_placements = []
-
-            for mask in product([0, 1], repeat=n):
-                placement = set()
-                for i, val in enumerate(mask):
-                    if val:
-                        placement.add(tiles_in_component[i])
-                
-                # Check if placement satisfies all constraints
-                valid = True
-                for free_neighbors, number in tile_constraints:
-                    count = len(placement & free_neighbors)
-                    if count != number:
-                        valid = False
-                        break
-                if valid:
-                    valid_placements.append(placement)
-
-            if not valid_placements:
+            sources = [(cell, int(self.board.show_number[cell])) for cell in component if self.board.free_neighbours(cell)]
+            result = self.patterns.solve(self.board, sources, cells, constraints)
+            if result is None:
                 continue
 
             # Determine tiles that are always bombs or always safe
-            all_bombs = set.intersection(*valid_placements)
-            all_safe = set(tiles_in_component) - set.union(*valid_placements)
+            all_safe, all_bombs = result
 
-            for tile in all_bombs:
-                if not tile.flagged:
-                    self.master.right_click_handler(tile)
+            for cell in all_bombs:
+                if not self.board.flagged[cell]:
+                    self.master.right_click_handler(cell)
                     made_progress = True
 
-            for tile in all_safe:
-                if tile.hidden and not tile.flagged:
-                    self.master.left_click_handler(tile)
-                    if self.master.go: break
+            for cell in all_safe:
+                if self.board.hidden[cell] and not self.board.flagged[cell]:
+                    self.master.left_click_handler(cell)
+                    if self.board.go: break
                     made_progress = True
 
         return made_progress
 
-    def divide_frontier_into_components(self) -> list[list[Tile]]:
-        frontier = set(self.master.frontier)
-        components = []
-        
-        while frontier:
-            tile = frontier.pop()
-            component = [tile]
-            queue = [tile]
-            
-            while queue:
-                current = queue.pop()
-                for neighbour in current.neighbours:
-                    if neighbour in frontier:
-                        frontier.remove(neighbour)
-                        queue.append(neighbour)
-                        component.append(neighbour)
-            components.append(component)
-        return components
+    def component_constraints(self, component:list[int]) -> tuple[list[int], list[tuple[list[int], int]]]:
+        # The unknown cells around a frontier component and its constraints over their indices in that list
+        cells = []
+        index = {}
+        constraints = []
+        for cell in component:
+            free_neighbours = self.board.free_neighbours(cell)
+            if free_neighbours:
+                for n in free_neighbours:
+                    if n not in index:
+                        index[n] = len(cells)
+                        cells.append(n)
+                constraints.append(([index[n] for n in free_neighbours], int(self.board.show_number[cell])))
+        return cells, constraints
+
+    def divide_frontier_into_components(self) -> list[list[int]]:
+        return self.board.frontier.components()
+
+class BackgroundSolver():
+
+    # Runs Automation in a worker thread on a copy of the board. Every move it makes on the copy is also put on
+    # a queue, and the main loop takes them from there at its own pace and plays them on the real board.
+    def __init__(self, board:Board, guess:bool = False):
+        self.board = board.copy()
+        self.guess = guess
+        self.moves = queue.Queue()
+        self.cancelled = threading.Event()
+        self.paused = False
+        self.steps = 0
+        self.done = False
+        self.automation = Automation(self)
+        self.thread = threading.Thread(target = self.run, daemon = True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            self.automation.solve(self.guess)
+        finally:
+            self.moves.put(None)
+
+    def left_click_handler(self, cell:int):
+        self.click(self.board.left_click_handler, "L", cell)
+
+    def right_click_handler(self, cell:int):
+        self.click(self.board.right_click_handler, "R", cell)
+
+    def click(self, action, code:str, cell:int):
+        if self.cancelled.is_set():
+            # Ending the copy's game stops every solver loop at its next check
+            self.board.go = True
+            return
+        action(cell)
+        self.moves.put((code, cell))
+
+    def cancel(self):
+        self.cancelled.set()
+        # Ending the copy's game now also stops the solver loops that are between clicks
+        self.board.go = True
+
+    def pause(self):
+        self.paused = not self.paused
+        self.steps = 0
+
+    def step(self):
+        # While paused, lets exactly one more move through
+        if self.paused:
+            self.steps += 1
+
+    def take(self, budget:int) -> list[tuple[str, int]]:
+        if self.paused:
+            budget = self.steps
+        moves = []
+        while len(moves) < budget and not self.done:
+            try:
+                move = self.moves.get_nowait()
+            except queue.Empty:
+                break
+            if move is None:
+                self.done = True
+            else:
+                moves.append(move)
+        if self.paused:
+            self.steps -= len(moves)
+        return moves
 
 class Game():
 
-    def __init__(self, screen:pygame.display, data:list):
+    # Milliseconds the GAME OVER / YOU WON banner stays up before returning to the menu
+    result_delay = 2000
+    # Moves per second the background solver's moves are played at
+    solver_rate = 30
+    # Boards whose tiles would be smaller than min_tile pixels on screen are shown through a Camera at camera_tile
+    min_tile = 16
+    camera_tile = 24
+
+    def __init__(self, screen:pygame.display, data:list, seed:int|None = None):
         self.start_time = None
-        self.firstclick = True
-        self.go = False
-        self.won = False
         self.data = data
         self.max_time = data[2]
         self.screen = screen
         self.screen_x, self.screen_y = self.screen.size
         self.map_size_in_tiles = data[0]
         self.number_of_bombs = int(self.map_size_in_tiles[0] * self.map_size_in_tiles[1] * data[1])
-        self.number_of_flags = 0
-        self.header_size = int(min(100, self.screen_y / 10))
-        self.tile_size = self.screen_x/self.map_size_in_tiles[0], (self.screen_y - self.header_size)/self.map_size_in_tiles[1]
+        self.header_size, self.tile_size = self.layout(self.screen.size, self.map_size_in_tiles)
 
-        self.mine_area = ((0, self.header_size), 
-                          (self.map_size_in_tiles[0]*self.tile_size[0], self.header_size + self.map_size_in_tiles[1]*self.tile_size[1]))
+        if self.needs_camera(self.screen.size, self.map_size_in_tiles):
+            self.mine_area = ((0, self.header_size), (self.screen_x, self.screen_y))
+        else:
+            self.mine_area = ((0, self.header_size), 
+                              (self.map_size_in_tiles[0]*self.tile_size[0], self.header_size + self.map_size_in_tiles[1]*self.tile_size[1]))
         self.font = pygame.font.SysFont(None, 48)
 
-        directory = os.path.join(os.path.dirname(__file__), "Sprites")
-        tilesheet = pygame.image.load(os.path.join(directory, "TILES ALL.png")).convert_alpha()
-        ts = 20
-        self.faces = []
-        self.frontier = []
-        for i in range(3):
-            for j in range(4):
-                rect = pygame.Rect(j * ts, i * ts, ts, ts)
-                tile_surface = pygame.Surface((ts, ts), pygame.SRCALPHA)
-                tile_surface.blit(tilesheet, (0, 0), rect)
-                tile_surface = pygame.transform.scale(tile_surface, self.tile_size)
-                self.faces.append(tile_surface)
-        
-        self.map_array = np.empty(self.map_size_in_tiles, dtype = object)
+        self.faces = SpriteCache.tiles(self.tile_size)
+
+        self.board = Board(self.map_size_in_tiles, self.number_of_bombs, seed)
+        self.changes = self.board.watch()
+        self.render_queue = RenderQueue(self.screen)
 
         self.header = Header(self)
 
-        for i in range(self.map_size_in_tiles[0]):
-            for j in range(self.map_size_in_tiles[1]):
-                self.map_array[i, j] = Tile(self, i, j, self.tile_size, self.faces[-1])
-        self.flat = self.map_array.flatten()
+        if self.needs_camera(self.screen.size, self.map_size_in_tiles):
+            self.camera = Camera(self, self.camera_tile)
+            self.camera.draw()
+        else:
+            self.camera = None
+            for cell in range(self.board.size):
+                self.screen.blit(self.faces[-1], self.tile_position(cell))
+        self.render_queue.add_all()
+        self.render_queue.flush()
         self.automation = Automation(self)
+        self.solver = None
+        # A cancelled solver's thread, waited for before the next one starts
+        self.stopped_solver = None
+        self.solver_budget = 0.0
+
+    @classmethod
+    def layout(cls, screen_size:tuple[float, float], map_size_in_tiles:tuple[int, int]) -> tuple[int, tuple[float, float]]:
+        header_size = int(min(100, screen_size[1] / 10))
+        if cls.needs_camera(screen_size, map_size_in_tiles):
+            return header_size, (cls.camera_tile, cls.camera_tile)
+        return header_size, (screen_size[0]/map_size_in_tiles[0], (screen_size[1] - header_size)/map_size_in_tiles[1])
+
+    @classmethod
+    def needs_camera(cls, screen_size:tuple[float, float], map_size_in_tiles:tuple[int, int]) -> bool:
+        header_size = int(min(100, screen_size[1] / 10))
+        return min(screen_size[0]/map_size_in_tiles[0], (screen_size[1] - header_size)/map_size_in_tiles[1]) < cls.min_tile
+
+    @property
+    def go(self) -> bool:
+        return self.board.go
 
-    def decide_bombs(self, to_avoid:Tile):
+    @go.setter
+    def go(self, value:bool):
+        self.board.go = value
 
-        filtered = np.array([x for x in self.flat if x not in [to_avoid] + to_avoid.neighbours])
-        self.bombs = np.random.choice(filtered, size = self.number_of_bombs, replace = False)
-        
-        for tile in self.bombs:
-            tile.bomb = True
+    @property
+    def won(self) -> bool:
+        return self.board.won
 
-        for tile in self.flat:
-            tile.update_number()
-            tile.update_show_number()
-    
-    def neighbours(self):
-        for tile in self.flat:
-            tile.get_neighbours()
+    @property
+    def number_of_flags(self) -> int:
+        return self.board.number_of_flags
+
+    @property
+    def configuration(self) -> tuple[int, int, int, int]:
+        return (*self.map_size_in_tiles, self.number_of_bombs, self.max_time)
+
+    def cell_at(self, x:float, y:float) -> int | None:
+        if self.camera is not None:
+            return self.camera.cell_at(x, y)
+        row, col = int((y - self.header_size)/self.tile_size[1]), int(x/self.tile_size[0])
+        return self.board.cell(col, row)
+
+    def tile_position(self, cell:int) -> tuple[float, float]:
+        if self.camera is not None:
+            return self.camera.tile_position(cell)
+        x, y = self.board.coords(cell)
+        return x * self.tile_size[0], y * self.tile_size[1] + self.header_size
+
+    def update_face(self, cell:int):
+        self.render_queue.add(self.screen.blit(self.faces[self.board.face_index(cell)], self.tile_position(cell)))
+
+    def render(self):
+        # Redraw every cell the board touched since the last frame and push them in one update
+        if self.camera is not None:
+            self.camera.render(self.changes)
+        else:
+            for cell in set(self.changes):
+                self.update_face(cell)
+        self.changes.clear()
+        self.render_queue.flush()
 
     def game_over(self):
-        for tile in self.bombs:
-            tile.hidden = False
-            tile.update_face()
+        self.board.game_over()
+        self.render()
         game_over_surface = self.font.render("GAME OVER", True, (255, 0, 0))
         text_rect = game_over_surface.get_rect(center=(self.screen_x//2, self.screen_y//2))
-        self.screen.blit(game_over_surface, text_rect)
-        self.go = True
+        self.render_queue.add(self.screen.blit(game_over_surface, text_rect))
         self.header.update_score()
-        pygame.display.flip()
-        pygame.time.delay(2000)
+        self.render_queue.flush()
+        pygame.time.delay(self.result_delay)
 
     def check_winning_condition(self):
-        win = True
-        for tile in self.flat:
-            if (not tile.bomb and tile.hidden) or (tile.bomb and not tile.flagged):
-                win = False
-        if win:
+        if self.board.check_winning_condition():
             game_over_surface = self.font.render("YOU WON", True, (255, 0, 0))
             text_rect = game_over_surface.get_rect(center=(self.screen_x//2, self.screen_y//2))
-            self.won = True
-            for tile in self.flat:
-                tile.show_number = tile.number
-                tile.update_face()
-            self.screen.blit(game_over_surface, text_rect)
+            self.render()
+            self.render_queue.add(self.screen.blit(game_over_surface, text_rect))
             self.header.update_score()
-            pygame.display.flip()
-            pygame.time.delay(2000)
+            self.render_queue.flush()
+            pygame.time.delay(self.result_delay)
+
+    def apply(self, action, *args):
+        # Run a board action and present a loss or a win the first time it happens
+        go, won = self.board.go, self.board.won
+        action(*args)
+        if self.board.go and not go:
+            self.game_over()
+        elif self.board.won and not won:
+            self.check_winning_condition()
 
-    def left_click_handler(self, current_tile:Tile):
-        if self.firstclick:
-            self.decide_bombs(current_tile)
-            self.firstclick = False
+    def left_click_handler(self, cell:int):
+        if self.board.firstclick:
             self.start_time = pygame.time.get_ticks()
-        
-        if current_tile.bomb and not current_tile.flagged:
-            self.game_over()
-        
-        if current_tile.number != 0 and current_tile.show_number == 0:
-            for tile in current_tile.neighbours:
-                if not tile.flagged:
-                    tile.discover_neighbours()
-            for tile in current_tile.neighbours:
-                if tile.bomb and not tile.flagged:
-                    self.game_over()
-                
-        current_tile.discover_neighbours()
-        self.check_winning_condition()
+        self.apply(self.board.left_click_handler, cell)
+        self.render()
     
-    def right_click_handler(self, current_tile:Tile):
-        if current_tile.hidden:
-            if not current_tile.flagged:
-                current_tile.flagged = True
-                self.number_of_flags += 1
-            else:
-                current_tile.flagged = False
-                self.number_of_flags -= 1
-            current_tile.update_face()  
-
-        for neighbour in current_tile.neighbours:
-            neighbour.update_show_number()
-            neighbour.update_face()
-
+    def right_click_handler(self, cell:int):
+        self.apply(self.board.right_click_handler, cell)
         self.header.update_header()
-        self.check_winning_condition()
+        self.render()
     
+    def automate(self, guess:bool = False, turbo:bool = False):
+        if not turbo:
+            self.automation.automate(guess)
+            return
+        # Turbo: every deduced move goes straight to the board, and the display is refreshed once at the end
+        self.join_solver()
+        self.apply(self.automate_board, guess)
+        # The header isn't updated during the solve, so this is where a solve that ran past the time limit ends the game
+        self.header.update_header()
+        self.render()
+
+    def start_solver(self, guess:bool = False):
+        if self.solver is not None or self.board.firstclick:
+            return
+        self.join_solver()
+        self.board.record("G" if guess else "A")
+        self.solver = BackgroundSolver(self.board, guess)
+        self.solver_budget = 0.0
+
+    def stop_solver(self):
+        if self.solver is not None:
+            self.solver.cancel()
+            self.stopped_solver = self.solver
+            self.solver = None
+
+    def join_solver(self):
+        # Lets a cancelled solver finish the step it is on, so no two solvers ever run at once
+        if self.stopped_solver is not None:
+            self.stopped_solver.thread.join()
+            self.stopped_solver = None
+
+    def play_solver(self, seconds:float):
+        # Plays the moves the background solver has found so far, as many as solver_rate allows for the time passed
+        solver = self.solver
+        if not solver.paused:
+            self.solver_budget = min(self.solver_budget + seconds * self.solver_rate, self.solver_rate)
+        moves = solver.take(int(self.solver_budget))
+        if not solver.paused:
+            self.solver_budget -= len(moves)
+        self.board.solving = True
+        try:
+            for code, cell in moves:
+                action = self.board.left_click_handler if code == "L" else self.board.right_click_handler
+                self.apply(action, cell)
+                if self.go or self.won:
+                    break
+        finally:
+            self.board.solving = False
+        self.header.update_header()
+        self.render()
+        if solver.done or self.go or self.won:
+            self.stop_solver()
+
+    def automate_board(self, guess:bool):
+        self.automation.master = self.board
+        try:
+            self.automation.automate(guess)
+        finally:
+            self.automation.master = self
+        if self.start_time is None and not self.board.firstclick:
+            self.start_time = pygame.time.get_ticks()
+
     def update_debug(self):
-        for tile in self.map_array.flatten():
-            tile.hidden = False
-            tile.update_face()
+        self.board.reveal_all()
+        self.render()
 
     @property
     def score(self):
         if self.start_time is None:
             return 0
+        return self.points(self.map_size_in_tiles, self.number_of_bombs, self.board.revealed, self.won, self.header.elapsed_seconds, self.max_time)
 
-        # Time
-        elapsed = self.header.elapsed_seconds
+    @staticmethod
+    def density(map_size_in_tiles:tuple[int, int], number_of_bombs:int) -> float:
+        # The density to build a Game with an exact bomb count: half a bomb of slack so int() lands on it
+        return (number_of_bombs + 0.5) / (map_size_in_tiles[0] * map_size_in_tiles[1])
 
+    @staticmethod
+    def points(map_size_in_tiles:tuple[int, int], number_of_bombs:int, revealed:int, won:bool, elapsed:float, max_time:int) -> int:
+        # revealed and won can also be arrays, to score many boards at once
         # Board
-        width, height = self.map_size_in_tiles
+        width, height = map_size_in_tiles
         A = width * height
-        B = self.number_of_bombs
+        B = number_of_bombs
         D = B / A
 
         # Difficulty
         difficulty_score = A * (1 + 3 * D)
 
         # Time factor
-        if self.max_time > 0:
-            time_bonus = (1 + 3600 / self.max_time) * (self.max_time - elapsed) * 0.85
+        if max_time > 0:
+            time_bonus = (1 + 3600 / max_time) * (max_time - elapsed) * 0.85
             time_factor = 1 / (1 + elapsed / A)
         else:
             time_bonus = 0
             time_factor = 1 / (1 + 1 / A)
 
         # Efficiency
-        revealed = sum(1 for t in self.flat if (not t.hidden or t.flagged))
-
         efficiency = revealed / A
-        won_bonus = 1.5 if self.won else 1
-        return int(difficulty_score * time_factor * efficiency * won_bonus + time_bonus)
+        won_bonus = 1 + 0.5 * np.asarray(won)
+        score = difficulty_score * time_factor * efficiency * won_bonus + time_bonus
+        return int(score) if np.ndim(score) == 0 else score.astype(np.int64)
+
+class Replay():
+
+    # A recorded game: the board settings, its seed and every [ms, code, cell] event.
+    # Codes: F first click, L/R player clicks, A/G solver started (G with guessing), l/r solver clicks.
+    def __init__(self, map_size_in_tiles:tuple[int, int], number_of_bombs:int, seed:int, events:list):
+        self.map_size_in_tiles = tuple(map_size_in_tiles)
+        self.number_of_bombs = number_of_bombs
+        self.seed = seed
+        self.events = [tuple(event) for event in events]
+
+    @classmethod
+    def from_board(cls, board:Board) -> Replay:
+        return cls(board.map_size_in_tiles, board.number_of_bombs, board.seed, board.events)
+
+    @classmethod
+    def load(cls, path:str) -> Replay:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["map_size"], data["bombs"], data["seed"], zip(data["ms"], data["codes"], data["cells"]))
+
+    def save(self, path:str):
+        # Stored column-wise with the codes as one string, a few bytes per event
+        ms, codes, cells = zip(*self.events) if self.events else ((), (), ())
+        data = {"map_size": list(self.map_size_in_tiles), "bombs": self.number_of_bombs, "seed": self.seed,
+                "ms": ms, "codes": "".join(codes), "cells": cells}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators = (",", ":"))
+
+    def board(self) -> Board:
+        return Board(self.map_size_in_tiles, self.number_of_bombs, self.seed)
+
+    def game(self, screen:pygame.Surface) -> Game:
+        return Game(screen, [self.map_size_in_tiles, Game.density(self.map_size_in_tiles, self.number_of_bombs), -1], self.seed)
+
+    def run(self, master:Game|Board|None = None, solve:bool = False) -> Game|Board:
+        # Re-executes every event at full speed. With solve the solver runs again wherever it was started
+        # and its recorded clicks are skipped, so it can be timed and profiled on the same positions.
+        master = self.board() if master is None else master
+        automation = Automation(master) if solve else None
+        for _, code, cell in self.events:
+            if master.go or master.won:
+                break
+            if code in "AG":
+                if solve:
+                    automation.automate(guess = code == "G")
+            elif code in "FLR" or not solve:
+                self.apply(master, code, cell)
+        return master
+
+    def play(self, game:Game, speed:float = 1.0):
+        # Re-renders the game in a window, waiting out the recorded time between events
+        start = pygame.time.get_ticks()
+        for ms, code, cell in self.events:
+            if game.go or game.won:
+                break
+            delay = int(ms / speed) - (pygame.time.get_ticks() - start)
+            if delay > 0:
+                game.header.update_header()
+                game.render()
+                pygame.time.wait(delay)
+            pygame.event.pump()
+            if code not in "AG":
+                self.apply(game, code, cell)
+        game.header.update_header()
+        game.render()
+
+    def apply(self, master:Game|Board, code:str, cell:int):
+        if code in "FLl":
+            master.left_click_handler(cell)
+        else:
+            master.right_click_handler(cell)
+
+class SavedGame():
+
+    # A game in progress as a versioned binary file: a fixed header with the settings, seed, state and clocks,
+    # then the mine, hidden and flagged cells as bit planes in cell order, then the event log. load() maps the file
+    # instead of reading it, so the header and planes of any number of saves can be looked at with no per-cell parsing.
+    magic = b"MSWP"
+    version = 1
+    header = np.dtype([("magic", "S4"), ("version", "<u2"), ("state", "<u2"), ("width", "<u4"), ("height", "<u4"),
+                       ("bombs", "<u4"), ("max_time", "<i4"), ("density", "<f8"), ("seed", "<i8"),
+                       ("elapsed_ms", "<i8"), ("log_ms", "<i8"), ("events", "<u8")])
+    # Bits of the state field
+    FIRSTCLICK, GO, WON = 1, 2, 4
+
+    def __init__(self, buffer:np.ndarray):
+        self.buffer = buffer
+        if len(buffer) < self.header.itemsize:
+            raise ValueError("not a saved game")
+        self.info = buffer[:self.header.itemsize].view(self.header)[0]
+        if self.info["magic"] != self.magic:
+            raise ValueError("not a saved game")
+        if self.info["version"] != self.version:
+            raise ValueError(f"saved game version {self.info['version']} is not supported")
+        self.map_size_in_tiles = (int(self.info["width"]), int(self.info["height"]))
+        self.size = self.map_size_in_tiles[0] * self.map_size_in_tiles[1]
+        self.number_of_bombs = int(self.info["bombs"])
+        self.seed = int(self.info["seed"])
+        # Every section starts on an 8 byte boundary
+        self.plane_bytes = -(-self.size // 64) * 8
+        self.events_start = self.header.itemsize + 3 * self.plane_bytes
+        self.planes = {}
+
+    @classmethod
+    def from_board(cls, board:Board, density:float | None = None, max_time:int = -1, elapsed_ms:int = 0) -> SavedGame:
+        if density is None:
+            density = Game.density(board.map_size_in_tiles, board.number_of_bombs)
+        header = np.zeros(1, dtype = cls.header)
+        header[0] = (cls.magic, cls.version, cls.FIRSTCLICK * board.firstclick | cls.GO * board.go | cls.WON * board.won,
+                     board.width, board.height, board.number_of_bombs, max_time, density, board.seed, elapsed_ms,
+                     int((time.perf_counter() - board.started) * 1000), len(board.events))
+        planes = np.zeros((3, -(-board.size // 64) * 8), dtype = np.uint8)
+        for plane, cells in zip(planes, (board.bomb, board.hidden, board.flagged)):
+            packed = np.packbits(cells)
+            plane[:len(packed)] = packed
+        events = board.events
+        ms = np.array([event[0] for event in events], dtype = "<i8")
+        cells = np.array([event[2] for event in events], dtype = "<i8")
+        codes = np.frombuffer("".join([event[1] for event in events]).encode("ascii"), dtype = np.uint8)
+        return cls(np.concatenate([header.view(np.uint8), planes.ravel(), ms.view(np.uint8), cells.view(np.uint8), codes]))
+
+    @classmethod
+    def from_game(cls, game:Game) -> SavedGame:
+        elapsed_ms = 0 if game.start_time is None else pygame.time.get_ticks() - game.start_time
+        return cls.from_board(game.board, game.data[1], game.max_time, elapsed_ms)
+
+    @classmethod
+    def load(cls, path:str) -> SavedGame:
+        return cls(np.memmap(path, dtype = np.uint8, mode = "r"))
+
+    def save(self, path:str):
+        # Written next to the old save and swapped in, so a crash mid-write never leaves a broken file behind
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(self.buffer.data)
+        os.replace(temporary, path)
+
+    def plane(self, index:int) -> np.ndarray:
+        # Unpacked from the mapped bits the first time it is asked for, then kept read-only
+        if index not in self.planes:
+            start = self.header.itemsize + index * self.plane_bytes
+            cells = np.unpackbits(self.buffer[start:start + self.plane_bytes], count = self.size).view(bool)
+            cells.flags.writeable = False
+            self.planes[index] = cells
+        return self.planes[index]
+
+    @property
+    def bomb(self) -> np.ndarray:
+        return self.plane(0)
+
+    @property
+    def hidden(self) -> np.ndarray:
+        return self.plane(1)
+
+    @property
+    def flagged(self) -> np.ndarray:
+        return self.plane(2)
+
+    @property
+    def events(self) -> list[tuple[int, str, int]]:
+        count = int(self.info["events"])
+        start = self.events_start
+        ms = self.buffer[start:start + 8 * count].view("<i8")
+        cells = self.buffer[start + 8 * count:start + 16 * count].view("<i8")
+        codes = self.buffer[start + 16 * count:start + 17 * count].tobytes().decode("ascii")
+        return list(zip(ms.tolist(), codes, cells.tolist()))
+
+    def restore(self, board:Board):
+        state = int(self.info["state"])
+        board.load_state(self.bomb, self.hidden, self.flagged, bool(state & self.FIRSTCLICK), bool(state & self.GO), bool(state & self.WON))
+        board.events = self.events
+        board.started = time.perf_counter() - int(self.info["log_ms"]) / 1000
+
+    def board(self) -> Board:
+        board = Board(self.map_size_in_tiles, self.number_of_bombs, self.seed)
+        self.restore(board)
+        return board
+
+    def game(self, screen:pygame.Surface) -> Game:
+        game = Game(screen, [self.map_size_in_tiles, float(self.info["density"]), int(self.info["max_time"])], self.seed)
+        if game.number_of_bombs != self.number_of_bombs:
+            raise ValueError("saved density does not give the saved bomb count")
+        self.restore(game.board)
+        if not game.board.firstclick:
+            game.start_time = pygame.time.get_ticks() - int(self.info["elapsed_ms"])
+        game.header.update_header()
+        game.render()
+        return game
+
+class ScoreStore():
+
+    # Every finished game in an SQLite table, indexed by configuration (width, height, bombs, max time) and score.
+    # The overall high score and the best `top` games of each configuration asked for are kept in memory
+    # and updated on insert, so the menu never goes back to the database to redraw.
+    columns = "score, width, height, bombs, max_time, seed, seconds, won, played_at"
+
+    def __init__(self, path:str, top:int = 10):
+        self.top = top
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS scores ({self.columns})")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS scores_by_configuration ON scores (width, height, bombs, max_time, score DESC)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score)")
+        self.high_score = self.connection.execute("SELECT MAX(score) FROM scores").fetchone()[0]
+        self.leaderboards = {}
+
+    def add(self, score:int, configuration:tuple[int, int, int, int], seed:int|None = None, seconds:float|None = None, won:bool = False):
+        self.add_many([(score, *configuration, seed, seconds, won, time.time())])
+
+    def add_many(self, rows:list[tuple]):
+        # Rows are in `columns` order, written in one transaction
+        with self.connection:
+            self.connection.executemany(f"INSERT INTO scores ({self.columns}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        for score, width, height, bombs, max_time, seed, seconds, won, played_at in rows:
+            if self.high_score is None or score > self.high_score:
+                self.high_score = score
+            board = self.leaderboards.get((width, height, bombs, max_time))
+            if board is not None and (len(board) < self.top or score > board[-1][0]):
+                board.append((score, seed, seconds, won, played_at))
+                board.sort(key = lambda entry: entry[0], reverse = True)
+                del board[self.top:]
+
+    def leaderboard(self, configuration:tuple[int, int, int, int]) -> list[tuple]:
+        # (score, seed, seconds, won, played_at) of the best games, read through the index once per configuration
+        board = self.leaderboards.get(configuration)
+        if board is None:
+            board = self.leaderboards[configuration] = self.connection.execute(
+                "SELECT score, seed, seconds, won, played_at FROM scores WHERE width = ? AND height = ? AND bombs = ? AND max_time = ? "
+                "ORDER BY score DESC LIMIT ?", (*configuration, self.top)).fetchall()
+        return board
+
+    def best(self, configuration:tuple[int, int, int, int]) -> int|None:
+        board = self.leaderboard(configuration)
+        return board[0][0] if board else None
+
+    def import_lines(self, path:str):
+        # Bare scores from the old scores.txt, without a configuration
+        with open(path, "r", encoding="utf-8") as f:
+            scores = [int(line.strip()) for line in f if line.strip().isdigit()]
+        self.add_many([(score, None, None, None, None, None, None, None, None) for score in scores])
+
+    def close(self):
+        self.connection.close()
 
 class Button():
     def __init__(self, menu:Menu, rect: pygame.Rect, options:list[list], title:str, font: pygame.font.Font, colors: tuple):
@@ -585,26 +2307,39 @@ class Button():
 
 class Menu():
 
+    # Frame rate cap for the menu and the game loop
+    fps = 60
+    # Seconds between autosaves of a running game
+    autosave_interval = 30
+    toggles = ["Map Size", "Difficulty", "Max Time"]
+    # Map sizes meant to be played through the camera, simulate.py and benchmark.py only run them when named
+    large_sizes = ["Huge", "Giant"]
+    pan_keys = {pygame.K_LEFT: (-1, 0), pygame.K_RIGHT: (1, 0), pygame.K_UP: (0, -1), pygame.K_DOWN: (0, 1)}
+    options = {
+        "Map Size":[["Small", (10, 10)], ["Medium", (20, 20)], ["Big", (30, 30)],  ["Bigger", (40, 40)], ["Massive", (50,40)], ["Huge", (150, 100)], ["Giant", (500, 500)]],
+        "Difficulty":[["Easiest", 0.05], ["Easy", 0.1], ["Medium", 0.15], ["Hard", 0.2], ["Harder", 0.25], ["Impossible", 0.4]],
+        "Max Time":[["Unlimited", -1], ["1 Hour", 3600], ["30 Mins", 1800], ["15 Mins", 900], ["10 Mins", 600], ["5 Mins", 300], ["1 Min", 60], ["30 Sec", 30], ["MADMAN", 10]]
+    }
+
     def __init__(self):
         
-        self.score_file = os.path.join(os.path.dirname(__file__), "scores.txt")
+        self.scores = ScoreStore(os.path.join(os.path.dirname(__file__), "scores.db"))
+        legacy_scores = os.path.join(os.path.dirname(__file__), "scores.txt")
+        if self.scores.high_score is None and os.path.exists(legacy_scores):
+            self.scores.import_lines(legacy_scores)
+        self.replay_directory = os.path.join(os.path.dirname(__file__), "Replays")
+        self.save_directory = os.path.join(os.path.dirname(__file__), "Saves")
         
         pygame.init()
-        bg = os.path.join(os.path.dirname(__file__), "Sprites", "background.png")
-        self.background = pygame.image.load(bg)
         self.monitor_size = (pygame.display.Info().current_w, pygame.display.Info().current_h)
         scale = (0.9, 0.9)
         self.screen_size = (self.monitor_size[0]*scale[0], self.monitor_size[1]*scale[1])
-        if self.screen_size[0] > self.background.get_width() or self.screen_size[1] > self.background.get_height():
-            self.background = pygame.transform.scale(self.background, self.screen_size)
-
         self.screen = pygame.display.set_mode(self.screen_size)
-        self.toggles = ["Map Size", "Difficulty", "Max Time"]
-        self.options = {
-            "Map Size":[["Small", (10, 10)], ["Medium", (20, 20)], ["Big", (30, 30)],  ["Bigger", (40, 40)], ["Massive", (50,40)]],
-            "Difficulty":[["Easiest", 0.05], ["Easy", 0.1], ["Medium", 0.15], ["Hard", 0.2], ["Harder", 0.25], ["Impossible", 0.4]],
-            "Max Time":[["Unlimited", -1], ["1 Hour", 3600], ["30 Mins", 1800], ["15 Mins", 900], ["10 Mins", 600], ["5 Mins", 300], ["1 Min", 60], ["30 Sec", 30], ["MADMAN", 10]]
-        }
+
+        self.background = SpriteCache.image("background.png")
+        if self.screen_size[0] > self.background.get_width() or self.screen_size[1] > self.background.get_height():
+            self.background = SpriteCache.image("background.png", self.screen_size)
+        SpriteCache.warm(self.screen.size, [option[1] for option in self.options["Map Size"]])
         self.buttons = []
         spaces = len(self.toggles) * 2 + 1
         width = self.screen_size[0]/spaces
@@ -616,7 +2351,6 @@ class Menu():
         self.main_menu()
             
     def main_menu(self):
-        self.get_high_score()
         self.screen.blit(self.background, (0, 0))
         font_title = pygame.font.SysFont(None, 72)
         font_prompt = pygame.font.SysFont(None, 48)
@@ -624,24 +2358,35 @@ class Menu():
         
         self.title_surface = font_title.render("MINESWEEPER", True, (255, 255, 255))
         self.prompt_surface = font_prompt.render("PRESS ENTER TO BEGIN", True, (255, 255, 255))
-        self.score_surface = score_font.render(f"HIGH SCORE: {self.high_score}", True, (255, 255, 255))
+        self.resume_surface = score_font.render("PRESS R TO RESUME THE LAST SAVED GAME", True, (255, 255, 255))
+        self.score_surface = score_font.render(self.score_text(), True, (255, 255, 255))
         
         # Get rects for centering
         self.title_rect = self.title_surface.get_rect(center=(self.screen_size[0] // 2, self.screen_size[1] // 2 - 50))
         self.prompt_rect = self.prompt_surface.get_rect(center=(self.screen_size[0] // 2, self.screen_size[1] // 2 + 50))
         self.score_rect = self.score_surface.get_rect(center = (self.screen_size[0]//2, self.screen_size[1] // 2))
+        self.resume_rect = self.resume_surface.get_rect(center = (self.screen_size[0]//2, self.screen_size[1] // 2 + 90))
         
         self.screen.blit(self.title_surface, self.title_rect)
         self.screen.blit(self.prompt_surface, self.prompt_rect)
         for button in self.buttons:
             button.draw()
             
+        clock = pygame.time.Clock()
         running = True
         while running:
-            self.score_surface = score_font.render(f"HIGH SCORE: {self.high_score}", True, (255, 255, 255))
+            # The text changes with the selected configuration, so the background goes back under the old one first
+            self.screen.blit(self.background, self.score_rect, self.score_rect)
+            self.score_surface = score_font.render(self.score_text(), True, (255, 255, 255))
+            self.score_rect = self.score_surface.get_rect(center = (self.screen_size[0]//2, self.screen_size[1] // 2))
             self.screen.blit(self.score_surface, self.score_rect)
+            self.screen.blit(self.background, self.resume_rect, self.resume_rect)
+            if self.saved_games():
+                self.screen.blit(self.resume_surface, self.resume_rect)
             pygame.display.flip()
-            for event in pygame.event.get():
+            clock.tick(self.fps)
+            # Sleep until something happens instead of redrawing the menu in a busy loop
+            for event in [pygame.event.wait()] + pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
                 if event.type == pygame.MOUSEBUTTONDOWN:
@@ -662,38 +2407,116 @@ class Menu():
                             self.data.append(button.data)
                             #Map Size, Difficulty, Max Time
                         running = self.run_game()
-
-    def run_game(self):
-        self.G = Game(self.screen, self.data)
-        self.G.neighbours()
+                    if event.key == pygame.K_r and self.saved_games():
+                        self.screen.fill((0, 0, 0))
+                        running = self.run_game(resume = True)
+
+    def run_game(self, resume:bool = False):
+        if resume:
+            path = self.saved_games()[-1]
+            try:
+                self.G = SavedGame.load(path).game(self.screen)
+            except ValueError:
+                self.G = None
+            if self.G is None:
+                # Unreadable, or written by another version: set aside where the menu no longer offers it, but kept.
+                # Renamed outside the except block, once the failed load has let go of its mapping of the file.
+                os.replace(path, f"{path}.bad")
+                return True
+            self.data = self.G.data
+        else:
+            self.G = Game(self.screen, self.data)
+        clock = pygame.time.Clock()
+        pygame.time.set_timer(CLOCK_TICK, 1000)
+        saved = pygame.time.get_ticks()
         #Main Game Loop
+        elapsed = 0
         while not self.G.go and not self.G.won:
-            self.G.header.update_header()
-            for event in pygame.event.get():
+            # Block until input or the clock tick arrives, then handle everything that is queued.
+            # While the background solver runs, wake up every frame to play its moves.
+            timeout = 1000 // self.fps if self.G.solver else 0
+            for event in [pygame.event.wait(timeout)] + pygame.event.get():
                 if event.type == pygame.QUIT:
+                    pygame.time.set_timer(CLOCK_TICK, 0)
+                    self.G.stop_solver()
+                    self.save_replay()
+                    self.save_game()
                     return False
-                if event.type == pygame.MOUSEBUTTONDOWN:
+                if event.type == pygame.MOUSEBUTTONDOWN and event.button in (1, 3):
                         x, y = pygame.mouse.get_pos()
                         if self.G.mine_area[0][0] <= x <= self.G.mine_area[1][0] and self.G.mine_area[0][1] <= y <=self.G.mine_area[1][1]:
-                            row, col = int((y- self.G.header_size)/self.G.tile_size[1]), int(x/self.G.tile_size[0])
-                            current_tile = self.G.map_array[col, row]
+                            current_cell = self.G.cell_at(x, y)
+                            if current_cell is None:
+                                # Beside the board of a zoomed out camera
+                                continue
+                            # A manual move makes the solver's copy of the board out of date
+                            self.G.stop_solver()
                             if event.button == 1:
-                                self.G.left_click_handler(current_tile)
+                                started = self.G.start_time is None
+                                self.G.left_click_handler(current_cell)
+                                if started:
+                                    # Line the one-second ticks up with the moment the clock started
+                                    pygame.time.set_timer(CLOCK_TICK, 1000)
                             
                             if event.button == 3:
-                                self.G.right_click_handler(current_tile)
+                                self.G.right_click_handler(current_cell)
+
+                if self.G.camera is not None:
+                    # Big boards: the mouse wheel zooms, dragging with the middle button or the arrow keys pan
+                    if event.type == pygame.MOUSEWHEEL:
+                        self.G.camera.zoom(event.y, pygame.mouse.get_pos())
+                    if event.type == pygame.MOUSEMOTION and event.buttons[1]:
+                        self.G.camera.pan(-event.rel[0], -event.rel[1])
+                    if event.type == pygame.KEYDOWN and event.key in self.pan_keys:
+                        dx, dy = self.pan_keys[event.key]
+                        self.G.camera.pan(dx * self.G.camera.area.width // 4, dy * self.G.camera.area.height // 4)
 
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_c:
+                        self.G.stop_solver()
                         self.G.update_debug()
                         pygame.time.delay(2000)
                         self.G.go = True
 
-                    if event.key == pygame.K_a:
-                        self.G.automation.automate()
-
-        self.save_score(self.G.score)
-        self.get_high_score()
+                    if event.key in (pygame.K_a, pygame.K_g) and self.G.solver is None:
+                        if event.mod & pygame.KMOD_SHIFT:
+                            # Turbo: the solver's moves are applied in bulk and the board is redrawn once at the end
+                            self.G.automate(guess = event.key == pygame.K_g, turbo = True)
+                        else:
+                            self.G.start_solver(guess = event.key == pygame.K_g)
+
+                    if self.G.solver is not None:
+                        if event.key == pygame.K_ESCAPE:
+                            self.G.stop_solver()
+                        elif event.key == pygame.K_SPACE:
+                            self.G.solver.pause()
+                        elif event.key == pygame.K_PERIOD:
+                            self.G.solver.step()
+                    if event.key == pygame.K_MINUS:
+                        self.G.solver_rate = max(1, self.G.solver_rate // 2)
+                    elif event.key == pygame.K_EQUALS:
+                        self.G.solver_rate = min(3840, self.G.solver_rate * 2)
+
+            if self.G.solver is not None:
+                self.G.play_solver(elapsed / 1000)
+            if not self.G.go:
+                self.G.header.update_header()
+            self.G.render()
+            elapsed = clock.tick(self.fps)
+            if pygame.time.get_ticks() - saved >= self.autosave_interval * 1000:
+                self.save_game()
+                saved = pygame.time.get_ticks()
+
+        pygame.time.set_timer(CLOCK_TICK, 0)
+        # A game lost on time can end with the solver still running
+        self.G.stop_solver()
+        self.G.join_solver()
+        # A finished game has nothing left to resume, the saves of other games are kept
+        if os.path.exists(self.save_path()):
+            os.remove(self.save_path())
+
+        self.save_replay()
+        self.save_score()
         
         self.screen.blit(self.background, (0, 0))
         self.screen.blit(self.title_surface, self.title_rect)
@@ -702,13 +2525,41 @@ class Menu():
             button.draw()
         return True
 
-    def save_score(self, score):
-        with open(self.score_file, "a", encoding="utf-8") as f:
-            f.write(f"{score}\n")
-    
-    def get_high_score(self):
-        with open(self.score_file, "r", encoding="utf-8") as f:
-            scores = [int(line.strip()) for line in f if line.strip().isdigit()]
-            self.high_score = max(scores)
+    def save_replay(self):
+        if self.G.board.firstclick:
+            return
+        os.makedirs(self.replay_directory, exist_ok = True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.G.board.seed}.json"
+        Replay.from_board(self.G.board).save(os.path.join(self.replay_directory, name))
+
+    def saved_games(self) -> list[str]:
+        # Every unfinished game has its own save, the most recently saved one last
+        if not os.path.isdir(self.save_directory):
+            return []
+        paths = [os.path.join(self.save_directory, name) for name in os.listdir(self.save_directory) if name.endswith(".msw")]
+        return sorted(paths, key = os.path.getmtime)
+
+    def save_path(self) -> str:
+        # Named by the seed, so a resumed game saves over its own file and never over another game's
+        return os.path.join(self.save_directory, f"{self.G.board.seed}.msw")
+
+    def save_game(self):
+        if self.G.board.firstclick or self.G.go or self.G.won:
+            return
+        os.makedirs(self.save_directory, exist_ok = True)
+        SavedGame.from_game(self.G).save(self.save_path())
+
+    def save_score(self):
+        self.scores.add(self.G.score, self.G.configuration, self.G.board.seed, self.G.header.elapsed_seconds, self.G.won)
+
+    def selected_configuration(self) -> tuple[int, int, int, int]:
+        (width, height), difficulty, max_time = (button.data for button in self.buttons)
+        return width, height, int(width * height * difficulty), max_time
+
+    def score_text(self) -> str:
+        best = self.scores.best(self.selected_configuration())
+        high_score = "-" if self.scores.high_score is None else self.scores.high_score
+        return f"HIGH SCORE: {high_score}   THIS SETUP: {'-' if best is None else best}"
 
-M = Menu()
+if __name__ == "__main__":
+    M = Menu()
@@ -0,0 +1,380 @@
+from __future__ import annotations
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+from itertools import product
+import numpy as np
+import pygame
+from Minesweeper import Board, Game, Automation, ConstraintSolver, Menu, VecEnv, neighbour_tables
+
+# Usage: python benchmark.py <benchmark> [options]
+# Runs without a window, so it can be used on CI machines and over ssh.
+
+class ClickRecorder():
+
+    # Stands in for Game as the Automation master and times every action it forwards
+    def __init__(self, game:Game):
+        self.game = game
+        self.board = game.board
+        self.actions = 0
+        self.seconds = 0.0
+        self.max_frames = 0
+
+    def left_click_handler(self, cell:int):
+        self.record(self.game.left_click_handler, cell)
+
+    def right_click_handler(self, cell:int):
+        self.record(self.game.right_click_handler, cell)
+
+    def record(self, action, cell:int):
+        frames = self.game.render_queue.frames
+        start = time.perf_counter()
+        action(cell)
+        self.seconds += time.perf_counter() - start
+        self.actions += 1
+        self.max_frames = max(self.max_frames, self.game.render_queue.frames - frames)
+
+def bench_render(args):
+    pygame.init()
+    screen = pygame.display.set_mode((args.width, args.height))
+    data = [tuple(args.size), args.difficulty, -1]
+
+    print(f"{'mode':<10}{'actions':>10}{'frames':>10}{'frames/action':>16}{'max frames':>12}{'ms/action':>12}")
+    for batched in (False, True):
+        actions = frames = max_frames = 0
+        seconds = 0.0
+        for seed in range(args.seeds):
+            game = Game(screen, data, seed)
+            game.result_delay = 0
+            game.render_queue.batched = batched
+            game.render_queue.frames = 0
+
+            recorder = ClickRecorder(game)
+            recorder.left_click_handler(game.board.cell(args.size[0]//2, args.size[1]//2))
+            Automation(recorder).automate()
+
+            actions += recorder.actions
+            seconds += recorder.seconds
+            frames += game.render_queue.frames
+            max_frames = max(max_frames, recorder.max_frames)
+        mode = "batched" if batched else "per-blit"
+        print(f"{mode:<10}{actions:>10}{frames:>10}{frames/actions:>16.2f}{max_frames:>12}{seconds/actions*1000:>12.3f}")
+    pygame.quit()
+
+def bench_viewport(args):
+    # Frame times of a board too big for the screen: clicks, panning, zooming and a full reveal through the camera
+    pygame.init()
+    screen = pygame.display.set_mode((args.width, args.height))
+    start = time.perf_counter()
+    game = Game(screen, [tuple(args.size), args.difficulty, -1], args.seed)
+    game.result_delay = 0
+    camera = game.camera
+    print(f"{args.size[0]}x{args.size[1]} in a {args.width}x{args.height} window, set up in {(time.perf_counter() - start) * 1000:.1f}ms")
+    if camera is None:
+        print("the board fits the window, no camera")
+        return
+
+    def frames(name:str, action, count:int):
+        times = []
+        for i in range(count):
+            start = time.perf_counter()
+            action(i)
+            game.render()
+            times.append(time.perf_counter() - start)
+        print(f"{name:<12}{count:>8}{1000*sum(times)/count:>12.2f}{1000*max(times):>12.2f}")
+
+    print(f"{'action':<12}{'frames':>8}{'mean ms':>12}{'max ms':>12}")
+    frames("first click", lambda i: game.left_click_handler(camera.cell_at(*camera.area.center)), 1)
+    frames("pan", lambda i: camera.pan(args.step * (1 if i // 50 % 2 == 0 else -1), args.step), args.frames)
+    frames("zoom", lambda i: camera.zoom(1 if i % 4 < 2 else -1, camera.area.center), args.frames // 4)
+    frames("reveal all", lambda i: game.board.reveal_all(), 1)
+    cached = sum(surface.get_width() * surface.get_height() * surface.get_bytesize() for surface in camera.chunks.values())
+    print(f"{len(camera.chunks)} chunks cached (limit {camera.limit}), {cached / 2**20:.1f}MB of tile surfaces")
+    pygame.quit()
+
+def bench_vecenv(args):
+    # Steps per second of the batched environment, with a random policy over each board's hidden cells
+    env = VecEnv(args.boards, tuple(args.size), int(args.size[0] * args.size[1] * args.difficulty))
+    env.reset(list(range(args.seed, args.seed + args.boards)))
+    rng = np.random.default_rng(args.seed)
+    seconds = 0.0
+    episodes = 0
+    for _ in range(args.steps):
+        actions = (rng.random(env.hidden.shape) * (env.hidden & ~env.flagged)).argmax(axis = 1)
+        start = time.perf_counter()
+        _, _, done, _ = env.step(actions)
+        seconds += time.perf_counter() - start
+        if done.any():
+            episodes += int(np.count_nonzero(done))
+            env.reset(boards = np.flatnonzero(done))
+    steps = args.boards * args.steps
+    print(f"{args.boards} boards of {args.size[0]}x{args.size[1]}: {steps} steps in {seconds:.2f}s, "
+          f"{steps/seconds:.0f} steps/s, {episodes} episodes finished")
+
+def enumerate_component(constraints:list[tuple[list[int], int]], n:int) -> tuple[list[int], list[int]] | None:
+    # The exhaustive 2^n enumeration hard_constraints_logic used before ConstraintSolver, kept as the baseline
+    scopes = [(set(scope), number) for scope, number in constraints]
+    valid_placements = []
+    for mask in product([0, 1], repeat=n):
+        placement = {i for i, val in enumerate(mask) if val}
+        if all(len(placement & scope) == number for scope, number in scopes):
+            valid_placements.append(placement)
+    if not valid_placements:
+        return None
+    all_bombs = set.intersection(*valid_placements)
+    all_safe = set(range(n)) - set.union(*valid_placements)
+    return sorted(all_safe), sorted(all_bombs)
+
+def stuck_components(size:tuple[int, int], difficulty:float, seed:int) -> list[tuple[list[int], list]]:
+    # Plays a seeded game and collects every frontier component the easy solver phases get stuck on.
+    # When the solver cannot move at all a random safe cell is revealed, so one game yields many positions.
+    rng = np.random.default_rng(seed)
+    board = Board(size, int(size[0] * size[1] * difficulty), seed)
+    automation = Automation(board)
+    board.left_click_handler(board.cell(size[0]//2, size[1]//2))
+    systems = []
+    while not board.go and not board.won:
+        easy = True
+        while easy and not board.go:
+            automation.check_completed()
+            easy = automation.equal_spaces_as_mines()
+            easy |= automation.pair_constraint_logic()
+        for component in automation.divide_frontier_into_components():
+            cells, constraints = automation.component_constraints(component)
+            if cells:
+                systems.append((cells, constraints))
+        if not board.go and not board.won and not automation.hard_constraints_logic():
+            safe = np.flatnonzero(board.hidden & ~board.bomb)
+            if len(safe) == 0:
+                break
+            board.left_click_handler(int(rng.choice(safe)))
+    return systems
+
+def bench_solver(args):
+    systems = []
+    for seed in range(args.seeds):
+        systems += stuck_components(tuple(args.size), args.difficulty, seed)
+
+    buckets = [(1, 11), (12, 19), (20, 39), (40, None)]
+    print(f"{len(systems)} components from {args.seeds} games on {args.size[0]}x{args.size[1]} at {args.difficulty}")
+    print(f"{'unknowns':<10}{'count':>8}{'enumerator/s':>16}{'backtracking/s':>16}{'max ms':>10}")
+    for low, high in buckets:
+        bucket = [(cells, constraints) for cells, constraints in systems
+                  if low <= len(cells) and (high is None or len(cells) <= high)]
+        if not bucket:
+            continue
+
+        solved = 0
+        start = time.perf_counter()
+        worst = 0.0
+        results = []
+        for cells, constraints in bucket:
+            one = time.perf_counter()
+            results.append(ConstraintSolver(constraints, len(cells)).solve())
+            worst = max(worst, time.perf_counter() - one)
+        backtracking = len(bucket) / (time.perf_counter() - start)
+
+        enumerator = "skipped"
+        if len(bucket[0][0]) <= args.enumerate_limit:
+            start = time.perf_counter()
+            for (cells, constraints), result in zip(bucket, results):
+                if len(cells) > args.enumerate_limit:
+                    continue
+                assert enumerate_component(constraints, len(cells)) == result
+                solved += 1
+            enumerator = f"{solved / (time.perf_counter() - start):.1f}"
+
+        label = f"{low}+" if high is None else f"{low}-{high}"
+        print(f"{label:<10}{len(bucket):>8}{enumerator:>16}{backtracking:>16.1f}{worst*1000:>10.2f}")
+
+def opened_board(size:tuple[int, int], difficulty:float, seed:int, openings:int) -> Board:
+    # A mid-game position: the first click plus a number of random safe openings and some correct flags
+    rng = np.random.default_rng(seed)
+    board = Board(size, int(size[0] * size[1] * difficulty), seed)
+    board.left_click_handler(board.cell(size[0]//2, size[1]//2))
+    for cell in rng.choice(np.flatnonzero(~board.bomb), openings, replace = False):
+        board.discover_neighbours(int(cell))
+    for cell in rng.choice(np.flatnonzero(board.bomb), openings // 4, replace = False):
+        board.right_click_handler(int(cell))
+    return board
+
+def bench_bitset(args):
+    print(f"{'phase':<16}{'sets ms':>10}{'bitsets ms':>12}{'speedup':>10}")
+    boards = [opened_board(tuple(args.size), args.difficulty, seed, args.openings) for seed in range(args.seeds)]
+    phases = [("pair logic", lambda automation: automation.pair_deductions())]
+    for name, phase in phases:
+        timings = []
+        for bitsets in (False, True):
+            automations = [Automation(board, bitsets = bitsets) for board in boards]
+            results = [phase(automation) for automation in automations]
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for automation in automations:
+                    phase(automation)
+            timings.append((time.perf_counter() - start) / (args.repeat * len(boards)))
+            if bitsets:
+                assert all(normalize(a) == normalize(b) for a, b in zip(results, reference))
+            reference = results
+        print(f"{name:<16}{timings[0]*1000:>10.3f}{timings[1]*1000:>12.3f}{timings[0]/timings[1]:>9.1f}x")
+
+def normalize(result) -> list:
+    # Compare set-backend and bitset-backend results regardless of container and ordering
+    return [sorted(part) for part in result]
+
+SOLVER_PHASES = ["check_completed", "equal_spaces_as_mines", "pair_constraint_logic", "hard_constraints_logic", "best_guess"]
+
+def timed(timings:dict, name:str, function):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+    return wrapper
+
+def suite_game(size:tuple[int, int], difficulty:float, seed:int) -> dict:
+    # Times every hot path of one seeded game: board setup, the first click, flood fills and each solver phase
+    timings = {}
+    bombs = int(size[0] * size[1] * difficulty)
+    centre = size[0]//2 * size[1] + size[1]//2
+
+    board = Board(size, bombs, seed)
+    # Board() has already built this shape's table, so empty the shared cache to time a real build
+    neighbour_tables.clear()
+    timed(timings, "build_neighbours", board.build_neighbours)()
+    timed(timings, "decide_bombs", board.decide_bombs)(centre)
+    board.firstclick = False
+    timed(timings, "first_flood_fill", board.discover_neighbours)(centre)
+
+    # Flood every zero region on a second copy of the same game
+    flooded = Board(size, bombs, seed)
+    flooded.decide_bombs(centre)
+    start = time.perf_counter()
+    for cell in np.flatnonzero(flooded.number == 0):
+        flooded.discover_neighbours(int(cell))
+    timings["flood_fill_all"] = time.perf_counter() - start
+
+    automation = Automation(board)
+    for name in SOLVER_PHASES:
+        setattr(automation, name, timed(timings, name, getattr(automation, name)))
+        timings[name] = 0.0
+    timed(timings, "full_solve", automation.automate)(guess = True)
+    return {"timings": timings, "won": board.won, "guesses": automation.guesses}
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output = True, text = True,
+                              cwd = os.path.dirname(os.path.abspath(__file__)), check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def bench_suite(args):
+    sizes = [option for option in Menu.options["Map Size"] if (option[0] in args.sizes if args.sizes else option[0] not in Menu.large_sizes)]
+    difficulties = [option for option in Menu.options["Difficulty"] if not args.difficulties or option[0] in args.difficulties]
+    seeds = list(range(args.seed, args.seed + args.seeds))
+    results = []
+    for size_name, size in sizes:
+        for difficulty_name, difficulty in difficulties:
+            games = [suite_game(size, difficulty, seed) for seed in seeds]
+            timings = {name: {"mean_ms": 1000 * sum(game["timings"][name] for game in games) / len(games),
+                              "min_ms": 1000 * min(game["timings"][name] for game in games)}
+                       for name in games[0]["timings"]}
+            results.append({"map_size": size_name, "difficulty": difficulty_name, "size": list(size), "density": difficulty,
+                            "bombs": int(size[0] * size[1] * difficulty), "seeds": seeds,
+                            "won": sum(game["won"] for game in games), "guesses": sum(game["guesses"] for game in games),
+                            "timings": timings})
+            print(f"{size_name:<8}{difficulty_name:<11}" + "".join(
+                f"{name}={timing['mean_ms']:.2f}ms " for name, timing in timings.items() if name in ("decide_bombs", "flood_fill_all", "full_solve")))
+
+    report = {"meta": {"commit": git_commit(), "python": platform.python_version(), "numpy": np.__version__,
+                       "machine": platform.machine(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+              "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent = 1)
+    if args.compare:
+        compare(report, args.compare, args.threshold)
+
+def compare(report:dict, path:str, threshold:float):
+    # Prints new/old best time for every preset and phase found in both reports, marking regressions.
+    # The best of the seeds is far less noisy than the mean on the small presets.
+    with open(path, "r", encoding="utf-8") as f:
+        baseline = {(result["map_size"], result["difficulty"]): result for result in json.load(f)["results"]}
+    print(f"compared with {path}: new/old best time, * marks a slowdown above {threshold:.2f}x")
+    for result in report["results"]:
+        old = baseline.get((result["map_size"], result["difficulty"]))
+        if old is None:
+            continue
+        ratios = []
+        for name, timing in result["timings"].items():
+            if name in old["timings"] and old["timings"][name]["min_ms"] > 0:
+                ratio = timing["min_ms"] / old["timings"][name]["min_ms"]
+                ratios.append(f"{name}={ratio:.2f}{'*' if ratio > threshold else ''}")
+        print(f"{result['map_size']:<8}{result['difficulty']:<11}" + " ".join(ratios))
+
+def main():
+    parser = argparse.ArgumentParser(description = "Minesweeper benchmarks")
+    benchmarks = parser.add_subparsers(dest = "benchmark", required = True)
+
+    render = benchmarks.add_parser("render", help = "display updates and latency per action, per-blit flips vs the render queue")
+    render.add_argument("--size", type = int, nargs = 2, default = (50, 40))
+    render.add_argument("--difficulty", type = float, default = 0.15)
+    render.add_argument("--seeds", type = int, default = 3)
+    render.add_argument("--width", type = int, default = 1280)
+    render.add_argument("--height", type = int, default = 800)
+    render.set_defaults(run = bench_render)
+
+    viewport = benchmarks.add_parser("viewport", help = "frame times of a board shown through the camera: clicks, panning, zooming and a full reveal")
+    viewport.add_argument("--size", type = int, nargs = 2, default = (1000, 1000))
+    viewport.add_argument("--difficulty", type = float, default = 0.15)
+    viewport.add_argument("--seed", type = int, default = 0)
+    viewport.add_argument("--frames", type = int, default = 400)
+    viewport.add_argument("--step", type = int, default = 40, help = "pixels panned per frame")
+    viewport.add_argument("--width", type = int, default = 1280)
+    viewport.add_argument("--height", type = int, default = 800)
+    viewport.set_defaults(run = bench_viewport)
+
+    vecenv = benchmarks.add_parser("vecenv", help = "steps per second of the batched environment with a random policy")
+    vecenv.add_argument("--size", type = int, nargs = 2, default = (10, 10))
+    vecenv.add_argument("--difficulty", type = float, default = 0.15)
+    vecenv.add_argument("--boards", type = int, default = 1024)
+    vecenv.add_argument("--steps", type = int, default = 200)
+    vecenv.add_argument("--seed", type = int, default = 0)
+    vecenv.set_defaults(run = bench_vecenv)
+
+    solver = benchmarks.add_parser("solver", help = "frontier components solved per second, 2^n enumeration vs ConstraintSolver")
+    solver.add_argument("--size", type = int, nargs = 2, default = (50, 40))
+    solver.add_argument("--difficulty", type = float, default = 0.2)
+    solver.add_argument("--seeds", type = int, default = 5)
+    solver.add_argument("--enumerate-limit", type = int, default = 16, help = "largest component the 2^n enumerator is run on")
+    solver.set_defaults(run = bench_solver)
+
+    bitset = benchmarks.add_parser("bitset", help = "pair logic, Python sets vs the bitboard backend")
+    bitset.add_argument("--size", type = int, nargs = 2, default = (50, 40))
+    bitset.add_argument("--difficulty", type = float, default = 0.2)
+    bitset.add_argument("--seeds", type = int, default = 5)
+    bitset.add_argument("--openings", type = int, default = 40)
+    bitset.add_argument("--repeat", type = int, default = 20)
+    bitset.set_defaults(run = bench_bitset)
+
+    suite = benchmarks.add_parser("suite", help = "every Map Size x Difficulty preset: board setup, flood fill and solver phases")
+    suite.add_argument("--seeds", type = int, default = 3)
+    suite.add_argument("--seed", type = int, default = 0, help = "first seed")
+    suite.add_argument("--sizes", nargs = "*", help = "Map Size presets to run (default all but Huge and Giant)")
+    suite.add_argument("--difficulties", nargs = "*", help = "Difficulty presets to run (default all)")
+    suite.add_argument("--output", help = "write the results as JSON")
+    suite.add_argument("--compare", help = "JSON results of an earlier run to compare against")
+    suite.add_argument("--threshold", type = float, default = 1.2, help = "slowdown ratio reported as a regression")
+    suite.set_defaults(run = bench_suite)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
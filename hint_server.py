@@ -0,0 +1,198 @@
+from __future__ import annotations
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import hashlib
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from Minesweeper import Board, Automation
+
+# Usage: python hint_server.py [--port 8765] [--workers N]
+# Serves the solver over local HTTP. POST /analyse a partially revealed board as JSON:
+#   {"rows": ["..1F", ...], "bombs": 10, "numbers": "shown"}
+# rows[y][x] is "." for hidden, "F" for flagged or the number on a revealed cell. "shown" numbers count the
+# mines still unflagged around the cell, as the game draws them, "total" ones count every mine around it.
+# The reply has the forced safe and mine cells as [x, y] and the mine probability of every cell as rows[y][x]
+# (null for revealed cells). GET /stats returns the cache counters.
+
+class HintMaster():
+
+    # Stands in for Game as the Automation master on a board whose mines are unknown: deduced mines are flagged
+    # so the next deductions can use them, deduced safe cells are only noted since their numbers aren't known
+    def __init__(self, board:Board):
+        self.board = board
+        self.safe = set()
+        self.mines = set()
+
+    def left_click_handler(self, cell:int):
+        if self.board.hidden[cell]:
+            self.safe.add(cell)
+        else:
+            # A chord on a number whose mines are all flagged: everything free around it is safe
+            self.safe.update(self.board.free_neighbours(cell))
+
+    def right_click_handler(self, cell:int):
+        board = self.board
+        if board.flagged[cell]:
+            return
+        self.mines.add(cell)
+        board.flagged[cell] = True
+        board.number_of_flags += 1
+        board.changed(cell)
+        for neighbour in board.neighbours[cell]:
+            board.show_number[neighbour] -= 1
+            if board.show_number[neighbour] == 0:
+                board.frontier.remove(neighbour)
+            board.changed(neighbour)
+
+def read_board(request:dict) -> Board:
+    rows, bombs = request["rows"], int(request["bombs"])
+    numbers = request.get("numbers", "shown")
+    if not rows or any(len(row) != len(rows[0]) for row in rows):
+        raise ValueError("rows must be a non-empty list of equally long strings")
+    if numbers not in ("shown", "total"):
+        raise ValueError('numbers must be "shown" or "total"')
+    # Cell order is x * height + y, so the grid is read column by column
+    grid = np.array([list(row) for row in rows]).T.ravel()
+    if not np.isin(grid, list(".F012345678")).all():
+        raise ValueError('cells must be ".", "F" or a digit from 0 to 8')
+
+    board = Board((len(rows[0]), len(rows)), bombs, 0)
+    board.firstclick = False
+    board.flagged[:] = grid == "F"
+    board.hidden[:] = (grid == ".") | board.flagged
+    board.number_of_flags = int(np.count_nonzero(board.flagged))
+    given = np.where(board.hidden, "0", grid).astype(np.int8)
+    flags = board.neighbour_sum(board.flagged)
+    board.number[:] = given + flags if numbers == "shown" else given
+    board.show_number[:] = board.number - flags
+    board.frontier.update(np.flatnonzero(~board.hidden & (board.show_number != 0)).tolist())
+    return board
+
+def analyse(request:dict) -> dict:
+    # The solver's certain phases until none of them finds anything, then the exact probabilities of what is left
+    board = read_board(request)
+    master = HintMaster(board)
+    automation = Automation(master)
+    progress = True
+    while progress:
+        easy = True
+        while easy:
+            automation.check_completed()
+            easy = automation.equal_spaces_as_mines()
+            easy |= automation.pair_constraint_logic()
+        progress = automation.hard_constraints_logic()
+
+    probability = automation.probabilities()
+    if probability is None:
+        raise ValueError("no placement of the mines fits this board")
+    unknown = board.hidden & ~board.flagged
+    safe = master.safe | set(np.flatnonzero(unknown & (probability == 0)).tolist())
+    mines = master.mines | set(np.flatnonzero(unknown & (probability == 1)).tolist())
+    probability = np.where(board.hidden, probability.round(6), np.nan).reshape(board.map_size_in_tiles).T
+    return {"safe": sorted(board.coords(cell) for cell in safe), "mines": sorted(board.coords(cell) for cell in mines),
+            "probabilities": [[None if np.isnan(p) else float(p) for p in row] for row in probability]}
+
+class HintServer(ThreadingHTTPServer):
+
+    # Requests are answered on their own threads and analysed on a pool of processes. Every board is cached by
+    # the hash of what was sent, as the future of its analysis, so a board asked for again, or while it is
+    # still being worked on, waits on the same result instead of being solved twice.
+    daemon_threads = True
+
+    def __init__(self, address:tuple[str, int], workers:int, cache_size:int, verbose:bool = False):
+        super().__init__(address, HintHandler)
+        self.verbose = verbose
+        self.pool = ProcessPoolExecutor(workers)
+        self.cache_size = cache_size
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def analyse(self, request:dict) -> dict:
+        key = hashlib.sha1(json.dumps([request.get("rows"), request.get("bombs"), request.get("numbers", "shown")]).encode()).hexdigest()
+        with self.lock:
+            future = self.cache.pop(key, None)
+            if future is None:
+                self.misses += 1
+                future = self.pool.submit(analyse, request)
+            else:
+                self.hits += 1
+            self.cache[key] = future
+            while len(self.cache) > self.cache_size:
+                del self.cache[next(iter(self.cache))]
+        try:
+            return future.result()
+        except Exception:
+            with self.lock:
+                if self.cache.get(key) is future:
+                    del self.cache[key]
+            raise
+
+    def stats(self) -> dict:
+        looked_up = self.hits + self.misses
+        return {"entries": len(self.cache), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / looked_up if looked_up else 0.0}
+
+class HintHandler(BaseHTTPRequestHandler):
+
+    # Keep-alive, so a client can send many boards over one connection, and no Nagle delay between a reply's
+    # headers and its body
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        if self.path != "/analyse":
+            return self.reply(404, {"error": f"no such endpoint {self.path}"})
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            request = json.loads(body)
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+            self.reply(200, self.server.analyse(request))
+        except (ValueError, KeyError, TypeError) as error:
+            self.reply(400, {"error": str(error) if not isinstance(error, KeyError) else f"missing {error}"})
+
+    def do_GET(self):
+        if self.path != "/stats":
+            return self.reply(404, {"error": f"no such endpoint {self.path}"})
+        self.reply(200, self.server.stats())
+
+    def reply(self, status:int, data:dict):
+        body = json.dumps(data, separators = (",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format:str, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Local HTTP service for solver hints")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8765)
+    parser.add_argument("--workers", type = int, default = os.cpu_count())
+    parser.add_argument("--cache", type = int, default = 10000, help = "boards kept in the result cache")
+    parser.add_argument("--verbose", action = "store_true", help = "log every request")
+    args = parser.parse_args()
+
+    server = HintServer((args.host, args.port), args.workers, args.cache, args.verbose)
+    print(f"serving hints on http://{args.host}:{args.port}/analyse with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.shutdown(cancel_futures = True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+from __future__ import annotations
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+import numpy as np
+from Minesweeper import Board, Automation, Menu
+
+# Usage: python load_test.py [--url http://127.0.0.1:8765] [--requests 2000] [--concurrency 16] [--boards 200]
+# Sends positions the solver got stuck on to a running hint_server.py from many threads at once, every board
+# several times, and prints the latency percentiles of first requests and of repeats served from the cache.
+
+def stuck_view(size:tuple[int, int], bombs:int, seed:int) -> list[str] | None:
+    # The board as the solver leaves it when it runs out of certain moves, as hint_server rows
+    board = Board(size, bombs, seed)
+    board.left_click_handler(board.cell(size[0]//2, size[1]//2))
+    Automation(board).automate()
+    if board.go or board.won:
+        return None
+    faces = np.where(board.flagged, "F", np.where(board.hidden, ".", board.show_number.astype(str)))
+    return ["".join(row) for row in faces.reshape(size).T]
+
+def client(url:str, jobs:list[tuple[int, dict]], results:list, lock:threading.Lock):
+    # One keep-alive connection per thread, each reply is timed from sending to the last byte read
+    address = urlsplit(url)
+    connection = http.client.HTTPConnection(address.hostname, address.port)
+    while True:
+        with lock:
+            if not jobs:
+                break
+            index, body = jobs.pop()
+        start = time.perf_counter()
+        connection.request("POST", "/analyse", body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        results.append((index, time.perf_counter() - start, response.status))
+    connection.close()
+
+def percentiles(name:str, seconds:list[float]):
+    if not seconds:
+        return
+    ms = 1000 * np.array(seconds)
+    print(f"{name:<10}{len(ms):>10}{np.percentile(ms, 50):>10.2f}{np.percentile(ms, 99):>10.2f}{ms.max():>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description = "Load test for hint_server.py")
+    parser.add_argument("--url", default = "http://127.0.0.1:8765")
+    parser.add_argument("--requests", type = int, default = 2000)
+    parser.add_argument("--concurrency", type = int, default = 16)
+    parser.add_argument("--boards", type = int, default = 200, help = "distinct positions, the rest of the requests repeat them")
+    parser.add_argument("--size", default = "Massive", help = "Map Size preset of the positions")
+    parser.add_argument("--difficulty", default = "Hard", help = "Difficulty preset of the positions")
+    parser.add_argument("--seed", type = int, default = 0, help = "first seed")
+    args = parser.parse_args()
+
+    size = dict(Menu.options["Map Size"])[args.size]
+    bombs = int(size[0] * size[1] * dict(Menu.options["Difficulty"])[args.difficulty])
+    boards = []
+    seed = args.seed
+    while len(boards) < args.boards:
+        rows = stuck_view(size, bombs, seed)
+        if rows is not None:
+            boards.append(json.dumps({"rows": rows, "bombs": bombs}))
+        seed += 1
+
+    # Every board goes out once before any repeat, the repeats come in a shuffled order
+    rng = np.random.default_rng(args.seed)
+    order = list(range(len(boards))) + rng.integers(len(boards), size = max(0, args.requests - len(boards))).tolist()
+    jobs = [(i, boards[b]) for i, b in enumerate(order)][::-1]
+    results = []
+    lock = threading.Lock()
+    threads = [threading.Thread(target = client, args = (args.url, jobs, results, lock)) for _ in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    first = [seconds for index, seconds, _ in results if index < len(boards)]
+    repeat = [seconds for index, seconds, _ in results if index >= len(boards)]
+    failed = sum(status != 200 for _, _, status in results)
+    print(f"{len(results)} requests for {len(boards)} {args.size} {args.difficulty} positions from {args.concurrency} threads "
+          f"in {elapsed:.2f}s ({len(results)/elapsed:.0f} requests/s), {failed} failed")
+    print(f"{'requests':<10}{'count':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    percentiles("first", first)
+    percentiles("repeat", repeat)
+    percentiles("all", first + repeat)
+
+if __name__ == "__main__":
+    main()
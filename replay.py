@@ -0,0 +1,51 @@
+from __future__ import annotations
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import cProfile
+import pstats
+import time
+import pygame
+from Minesweeper import Replay
+
+# Usage: python replay.py Replays/<game>.json [--solve] [--profile] [--window [--speed 2]]
+# Re-executes a recorded game headlessly at full speed, or re-renders it in a window at the recorded pace.
+
+def main():
+    parser = argparse.ArgumentParser(description = "Replay a recorded game")
+    parser.add_argument("path")
+    parser.add_argument("--solve", action = "store_true", help = "rerun the solver where it was started instead of its recorded clicks")
+    parser.add_argument("--profile", action = "store_true", help = "profile the headless replay and print the hottest functions")
+    parser.add_argument("--window", action = "store_true", help = "re-render the game at the recorded pace")
+    parser.add_argument("--speed", type = float, default = 1.0, help = "playback speed multiplier for --window")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    width, height = replay.map_size_in_tiles
+    print(f"{width}x{height}, {replay.number_of_bombs} bombs, seed {replay.seed}, {len(replay.events)} events")
+
+    if args.window:
+        pygame.init()
+        screen = pygame.display.set_mode((min(1600, width * 32), min(1000, height * 32 + 100)))
+        game = replay.game(screen)
+        replay.play(game, args.speed)
+        pygame.time.wait(game.result_delay)
+        pygame.quit()
+        board = game.board
+    else:
+        profile = cProfile.Profile() if args.profile else None
+        start = time.perf_counter()
+        if profile:
+            profile.enable()
+        board = replay.run(solve = args.solve)
+        if profile:
+            profile.disable()
+        print(f"replayed in {(time.perf_counter() - start) * 1000:.1f}ms")
+        if profile:
+            pstats.Stats(profile).sort_stats("cumulative").print_stats(25)
+
+    print("won" if board.won else "lost" if board.go else "unfinished", f"with {board.revealed_safe} safe tiles revealed")
+
+if __name__ == "__main__":
+    main()
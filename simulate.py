@@ -0,0 +1,134 @@
+from __future__ import annotations
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import time
+from multiprocessing import Pool, Barrier
+from Minesweeper import Board, Automation, Game, Menu, Replay, PatternCache, ScoreStore
+
+# Usage: python simulate.py [--games N] [--sizes ...] [--difficulties ...] [--output simulations.jsonl]
+# Plays seeded games with the auto-solver on every core, without a window, and streams one JSON line per game.
+# With --scores every game is also recorded in a score store (such as the game's scores.db), one transaction per batch.
+
+class CountingMaster():
+
+    # Stands in for Game as the Automation master, forwarding clicks to the board and counting them
+    def __init__(self, board:Board):
+        self.board = board
+        self.clicks = 0
+
+    def left_click_handler(self, cell:int):
+        self.clicks += 1
+        self.board.left_click_handler(cell)
+
+    def right_click_handler(self, cell:int):
+        self.clicks += 1
+        self.board.right_click_handler(cell)
+
+def init_worker(patterns:str | None, barrier:Barrier):
+    global export_barrier
+    export_barrier = barrier
+    if patterns and os.path.exists(patterns):
+        Automation.patterns.load(patterns)
+
+def export_patterns(path:str) -> str:
+    # One call per worker: each waits at the barrier until every worker has taken its call
+    part = f"{path}.{os.getpid()}"
+    Automation.patterns.save(part)
+    export_barrier.wait()
+    return part
+
+def play(task:tuple[str, tuple[int, int], str, float, int, bool, float | None]) -> dict:
+    size_name, size, difficulty_name, difficulty, seed, guess, save_slower = task
+    board = Board(size, int(size[0] * size[1] * difficulty), seed)
+    master = CountingMaster(board)
+    automation = Automation(master)
+    hits, misses = automation.patterns.hits, automation.patterns.misses
+
+    start = time.perf_counter()
+    master.left_click_handler(board.cell(size[0]//2, size[1]//2))
+    automation.automate(guess = guess)
+    seconds = time.perf_counter() - start
+    if save_slower is not None and seconds * 1000 > save_slower:
+        os.makedirs("Replays", exist_ok = True)
+        Replay.from_board(board).save(os.path.join("Replays", f"{size_name}-{difficulty_name}-{seed}.json"))
+
+    return {"map_size": size_name, "difficulty": difficulty_name, "seed": seed, "won": board.won, "lost": board.go,
+            "score": Game.points(size, board.number_of_bombs, board.revealed, board.won, seconds, -1), "clicks": master.clicks, "guesses": automation.guesses, "seconds": seconds,
+            "pattern_hits": automation.patterns.hits - hits, "pattern_misses": automation.patterns.misses - misses}
+
+def tasks(sizes:list, difficulties:list, seeds:range, guess:bool, save_slower:float | None):
+    for size_name, size in sizes:
+        for difficulty_name, difficulty in difficulties:
+            for seed in seeds:
+                yield size_name, size, difficulty_name, difficulty, seed, guess, save_slower
+
+def main():
+    parser = argparse.ArgumentParser(description = "Batch auto-solver simulations over the board presets")
+    parser.add_argument("--games", type = int, default = 1000, help = "games per preset")
+    parser.add_argument("--seed", type = int, default = 0, help = "first seed")
+    parser.add_argument("--sizes", nargs = "*", help = "Map Size presets to run (default all but Huge and Giant)")
+    parser.add_argument("--difficulties", nargs = "*", help = "Difficulty presets to run (default all)")
+    parser.add_argument("--no-guess", action = "store_true", help = "stop at the first position without a certain move")
+    parser.add_argument("--processes", type = int, default = os.cpu_count())
+    parser.add_argument("--output", default = "simulations.jsonl")
+    parser.add_argument("--patterns", metavar = "PATH", help = "load solved component patterns from PATH and save them back at the end")
+    parser.add_argument("--save-slower", type = float, metavar = "MS", help = "save a replay of every game slower than MS to Replays/")
+    parser.add_argument("--scores", metavar = "PATH", help = "record every game in the score store at PATH")
+    parser.add_argument("--batch", type = int, default = 10000, help = "games per score store transaction")
+    args = parser.parse_args()
+
+    sizes = [option for option in Menu.options["Map Size"] if (option[0] in args.sizes if args.sizes else option[0] not in Menu.large_sizes)]
+    difficulties = [option for option in Menu.options["Difficulty"] if not args.difficulties or option[0] in args.difficulties]
+    seeds = range(args.seed, args.seed + args.games)
+    configurations = {(size_name, difficulty_name): (*size, int(size[0] * size[1] * difficulty), -1)
+                      for size_name, size in sizes for difficulty_name, difficulty in difficulties}
+    scores = ScoreStore(args.scores) if args.scores else None
+    rows = []
+
+    # Only running totals are kept per preset, every game goes to disk as soon as it finishes
+    totals = {}
+    hits = misses = 0
+    start = time.perf_counter()
+    with Pool(args.processes, init_worker, (args.patterns, Barrier(args.processes))) as pool, open(args.output, "w", encoding="utf-8") as f:
+        for result in pool.imap_unordered(play, tasks(sizes, difficulties, seeds, not args.no_guess, args.save_slower), chunksize = 16):
+            f.write(json.dumps(result) + "\n")
+            total = totals.setdefault((result["map_size"], result["difficulty"]), {"games": 0, "won": 0, "clicks": 0, "guesses": 0, "seconds": 0.0})
+            total["games"] += 1
+            total["won"] += result["won"]
+            total["clicks"] += result["clicks"]
+            total["guesses"] += result["guesses"]
+            total["seconds"] += result["seconds"]
+            hits += result["pattern_hits"]
+            misses += result["pattern_misses"]
+            if scores:
+                rows.append((result["score"], *configurations[result["map_size"], result["difficulty"]], result["seed"],
+                             result["seconds"], result["won"], time.time()))
+                if len(rows) >= args.batch:
+                    scores.add_many(rows)
+                    rows = []
+        if scores:
+            scores.add_many(rows)
+            scores.close()
+        if args.patterns:
+            patterns = PatternCache()
+            for part in pool.map(export_patterns, [args.patterns] * args.processes, chunksize = 1):
+                patterns.load(part)
+                os.remove(part)
+            patterns.save(args.patterns)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'map size':<10}{'difficulty':<12}{'games':>8}{'win rate':>10}{'clicks':>10}{'guesses':>10}{'ms/game':>10}")
+    for (size_name, difficulty_name), total in totals.items():
+        games = total["games"]
+        print(f"{size_name:<10}{difficulty_name:<12}{games:>8}{total['won']/games:>10.1%}{total['clicks']/games:>10.1f}"
+              f"{total['guesses']/games:>10.2f}{1000*total['seconds']/games:>10.2f}")
+    games = sum(total["games"] for total in totals.values())
+    if hits + misses:
+        print(f"pattern cache: {hits/(hits + misses):.1%} of {hits + misses} components solved from the cache")
+    print(f"{games} games in {elapsed:.1f}s ({games/elapsed:.0f} games/s) on {args.processes} processes, results in {args.output}")
+
+if __name__ == "__main__":
+    main()